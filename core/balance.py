@@ -0,0 +1,68 @@
+class Balance:
+    """数值平衡参数：塔的数值、AP 消耗和惩罚系数"""
+
+    def __init__(self,
+                 generator_energy=None,
+                 amplifier_multipliers=None,
+                 collector_efficiencies=None,
+                 start_ap=100,
+                 place_cost=5,
+                 remove_cost=1,
+                 upgrade_factor=3,
+                 penalty_base=0.5,
+                 penalty_major_ratio=0.3,
+                 penalty_major_factor=1.5):
+        # G 塔基础能量 1级: 100, 2级: 125, 3级: 150, 4级: 175, 5级: 200
+        self.generator_energy = generator_energy or {1: 100, 2: 125, 3: 150, 4: 175, 5: 200}
+        # A 塔放大倍数 1级: 1.25, 2级: 1.45, 3级: 1.6, 4级: 1.72, 5级: 1.82
+        self.amplifier_multipliers = amplifier_multipliers or {1: 1.25, 2: 1.45, 3: 1.6, 4: 1.72, 5: 1.82}
+        # C 塔收集效率 1级: 60%, 2级: 72%, 3级: 81%, 4级: 87%, 5级: 91%
+        self.collector_efficiencies = collector_efficiencies or {1: 0.60, 2: 0.72, 3: 0.81, 4: 0.87, 5: 0.91}
+
+        self.start_ap = start_ap
+        self.place_cost = place_cost  # 放置1级塔
+        self.remove_cost = remove_cost  # 移除塔
+        self.upgrade_factor = upgrade_factor  # 从n级升级到n+1级消耗 upgrade_factor*n AP
+
+        # Penalty = 损失能量 × penalty_base × (1 + 0.5 × I_{单次损失>总输出30%})
+        self.penalty_base = penalty_base
+        self.penalty_major_ratio = penalty_major_ratio
+        self.penalty_major_factor = penalty_major_factor
+
+    def upgrade_cost(self, level):
+        return self.upgrade_factor * level
+
+    def min_action_cost(self):
+        return min(self.place_cost, self.upgrade_cost(1), self.remove_cost)
+
+    def penalty(self, wasted, max_single_waste, total_output):
+        multiplier = self.penalty_base
+        if total_output > 0 and max_single_waste > total_output * self.penalty_major_ratio:
+            multiplier *= self.penalty_major_factor
+        return wasted * multiplier
+
+    def replace(self, **changes):
+        """返回修改了部分参数的新 Balance"""
+        params = self.to_dict()
+        params.update(changes)
+        return Balance(**params)
+
+    def to_dict(self):
+        return {
+            "generator_energy": dict(self.generator_energy),
+            "amplifier_multipliers": dict(self.amplifier_multipliers),
+            "collector_efficiencies": dict(self.collector_efficiencies),
+            "start_ap": self.start_ap,
+            "place_cost": self.place_cost,
+            "remove_cost": self.remove_cost,
+            "upgrade_factor": self.upgrade_factor,
+            "penalty_base": self.penalty_base,
+            "penalty_major_ratio": self.penalty_major_ratio,
+            "penalty_major_factor": self.penalty_major_factor,
+        }
+
+    def __repr__(self):
+        return f"Balance({self.to_dict()!r})"
+
+
+DEFAULT_BALANCE = Balance()
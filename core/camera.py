@@ -0,0 +1,84 @@
+import math
+
+# 可选的缩放级别（每格像素），离散化后每一级的格子贴图只需渲染一次
+ZOOM_LEVELS = (4, 6, 8, 12, 16, 24, 35, 50, 70, 100, 140)
+
+
+class Camera:
+    """
+    棋盘视口：负责平移、缩放、可见范围裁剪以及屏幕坐标与格子坐标的换算。
+    (x, y) 是视口左上角对应的棋盘坐标（单位：格），cell_size 是当前每格像素。
+    """
+
+    def __init__(self, view_x, view_y, view_w, view_h, cell_size=70, board_size=None):
+        self.view_x = view_x
+        self.view_y = view_y
+        self.view_w = view_w
+        self.view_h = view_h
+        self.cell_size = cell_size
+        self.board_size = board_size  # 设置后平移时不会移出棋盘
+        self.x = 0.0
+        self.y = 0.0
+
+    @property
+    def view_rect(self):
+        return (self.view_x, self.view_y, self.view_w, self.view_h)
+
+    def to_screen(self, wx, wy):
+        """棋盘坐标（可为小数）-> 屏幕像素"""
+        return (self.view_x + (wx - self.x) * self.cell_size,
+                self.view_y + (wy - self.y) * self.cell_size)
+
+    def to_cell(self, px, py):
+        """屏幕像素 -> 格子坐标，视口外返回 None"""
+        if not (self.view_x <= px < self.view_x + self.view_w and self.view_y <= py < self.view_y + self.view_h):
+            return None
+        return (math.floor(self.x + (px - self.view_x) / self.cell_size),
+                math.floor(self.y + (py - self.view_y) / self.cell_size))
+
+    def visible_cells(self, board_size):
+        """可见格子的范围 (x0, x1, y0, y1)，右/下边界不含"""
+        x0 = max(0, math.floor(self.x))
+        y0 = max(0, math.floor(self.y))
+        x1 = min(board_size, math.ceil(self.x + self.view_w / self.cell_size))
+        y1 = min(board_size, math.ceil(self.y + self.view_h / self.cell_size))
+        return x0, x1, y0, y1
+
+    def covers_view(self):
+        """棋盘是否铺满整个视口（此时绘制前无需清空背景）"""
+        if self.board_size is None or self.x < 0 or self.y < 0:
+            return False
+        return ((self.board_size - self.x) * self.cell_size >= self.view_w and
+                (self.board_size - self.y) * self.cell_size >= self.view_h)
+
+    def pan(self, dx_px, dy_px):
+        """按屏幕像素平移（正值表示内容向右/下移动）"""
+        self.x -= dx_px / self.cell_size
+        self.y -= dy_px / self.cell_size
+        self.clamp()
+
+    def zoom(self, steps, px=None, py=None):
+        """按缩放级别放大（steps > 0）或缩小，(px, py) 处的棋盘位置保持不动"""
+        if px is None:
+            px = self.view_x + self.view_w / 2
+            py = self.view_y + self.view_h / 2
+        levels = ZOOM_LEVELS
+        current = min(range(len(levels)), key=lambda i: abs(levels[i] - self.cell_size))
+        new_size = levels[max(0, min(len(levels) - 1, current + steps))]
+        if new_size == self.cell_size:
+            return
+        wx = self.x + (px - self.view_x) / self.cell_size
+        wy = self.y + (py - self.view_y) / self.cell_size
+        self.cell_size = new_size
+        self.x = wx - (px - self.view_x) / new_size
+        self.y = wy - (py - self.view_y) / new_size
+        self.clamp()
+
+    def clamp(self):
+        if self.board_size is None:
+            return
+        # 棋盘比视口小时固定在左上角
+        max_x = max(0.0, self.board_size - self.view_w / self.cell_size)
+        max_y = max(0.0, self.board_size - self.view_h / self.cell_size)
+        self.x = min(max(self.x, 0.0), max_x)
+        self.y = min(max(self.y, 0.0), max_y)
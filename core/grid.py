@@ -1,28 +1,73 @@
+import copy
+import math
 import random
 import pygame
 from core.cell import Cell
+from core.balance import DEFAULT_BALANCE
+from core import trace as energy_trace
+from core.sprites import TILES, ENERGY_COLORS
+from core.camera import Camera
+from core.towers import TowerRegistry
 
 CELL_SIZE = 70
 GRID_SIZE = 8
+LINE_TILE = 8  # 能量线按 LINE_TILE × LINE_TILE 格分块索引，绘制时只查看可见的块
+
+# 布局文本编码中塔类型的字母
+TOWER_LETTERS = {Cell.G: 'G', Cell.A: 'A', Cell.C: 'C'}
+LETTER_TOWERS = {letter: t for t, letter in TOWER_LETTERS.items()}
+
+class _SnapshotColumn:
+    """Grid.snapshot() 副本的一列：塔格子来自复制的塔列表，其余按障碍物位图返回共用的格子"""
+    EMPTY = Cell(-1, -1)
+    OBSTACLE = Cell(-1, -1)
+    OBSTACLE.type = Cell.OBSTACLE
+
+    def __init__(self, x, size, obstacles):
+        self.base = x * size
+        self.obstacles = obstacles
+        self.towers = {}  # y -> Cell
+
+    def __getitem__(self, y):
+        cell = self.towers.get(y)
+        if cell is not None:
+            return cell
+        return self.OBSTACLE if self.obstacles[self.base + y] else self.EMPTY
 
-COLORS = {
-    Cell.EMPTY: (40, 40, 40),
-    Cell.OBSTACLE: (100, 100, 100),
-    Cell.G: (80, 160, 80),
-    Cell.A: (80, 80, 180),
-    Cell.C: (180, 120, 60),
-}
 
 class Grid:
-    def __init__(self):
-        self.size = GRID_SIZE
+    def __init__(self, trace=None, seed=None, puzzle=None, balance=None, size=None):
+        # 沙盒模式可使用更大的棋盘；未指定时谜题按谜题包的尺寸
+        self.size = size or (puzzle.grid_size if puzzle is not None else GRID_SIZE)
+        self.balance = balance or DEFAULT_BALANCE  # 数值参数，见 core/balance.py
+        self.puzzle = puzzle  # 来自谜题包的地图（core.puzzle_pack.Puzzle），None 表示随机生成
+        if puzzle is not None:
+            seed = puzzle.seed
+        if seed is None:
+            seed = random.randrange(2 ** 31)
+        self.seed = seed  # 地图种子（未指定时随机选取，便于存档和复现）
+        self.rng = random.Random(seed)
         self.cells = [[Cell(x, y) for y in range(self.size)] for x in range(self.size)]
-        self.generate_obstacles(10)
+        self.towers = TowerRegistry(self.size)  # 按类型索引的塔，格子变化时由 Cell 同步
+        for column in self.cells:
+            for cell in column:
+                cell.towers = self.towers
+                if balance is not None:
+                    cell.balance = balance
+        if puzzle is not None:
+            self.load_puzzle(puzzle)
+        else:
+            # 障碍物密度与 8×8 棋盘上的 10 个保持一致
+            self.generate_obstacles(10 * self.size * self.size // (GRID_SIZE * GRID_SIZE))
         self.energy_lines = []  # 存储能量传播线段
+        self._line_index = (None, {})  # (建立索引时的 energy_lines, 分块索引)，见 line_buckets
+        self.trace = trace  # 可选的逐射线遥测（core.trace.EnergyTrace）
+        if trace is not None:
+            trace.begin_game()
 
     def generate_obstacles(self, n):
         positions = [(x, y) for x in range(self.size) for y in range(self.size)]
-        random.shuffle(positions)
+        self.rng.shuffle(positions)
 
         count = 0
         for x, y in positions:
@@ -45,80 +90,164 @@ class Grid:
                     cell.set_obstacle()
                     count += 1
 
-    def draw(self, screen, hud_offset=60):
+    def load_puzzle(self, puzzle):
+        """按谜题包中的障碍物位图放置障碍物"""
+        if puzzle.grid_size != self.size:
+            raise ValueError(f"Puzzle grid size {puzzle.grid_size} does not match board size {self.size}")
+        for x in range(self.size):
+            for y in range(self.size):
+                if puzzle.is_obstacle(x, y):
+                    self.cells[x][y].set_obstacle()
+
+    def __deepcopy__(self, memo):
+        """深拷贝不复制遥测（EnergyTrace 的预分配缓冲区），副本不记录遥测"""
+        grid = Grid.__new__(Grid)
+        memo[id(self)] = grid
+        for name, value in self.__dict__.items():
+            setattr(grid, name, None if name == "trace" else copy.deepcopy(value, memo))
+        return grid
+
+    def snapshot(self):
+        """
+        用于在后台线程计算能量传播的只读副本，不带遥测。
+        只复制塔（开销与塔数有关），其余格子由障碍物位图给出，与原棋盘共享；
+        副本的 cells 只支持 cells[x][y] 读取，不能用来修改布局。
+        """
+        grid = copy.copy(self)
+        grid.trace = None
+        grid.towers = self.towers.frozen()
+        grid.cells = [_SnapshotColumn(x, self.size, grid.towers.obstacles) for x in range(self.size)]
+        for t, x, y, level in grid.towers:
+            cell = Cell(x, y)
+            cell.type = t
+            cell.level = level
+            cell.balance = self.balance
+            grid.cells[x].towers[y] = cell
+        grid.energy_lines = []
+        return grid
+
+    @classmethod
+    def from_board_code(cls, code, balance=None):
+        """由 board_code() 的结果还原棋盘"""
+        grid = cls(seed=0, balance=balance, size=math.isqrt(len(code) // 2))
+        grid.load_board_code(code)
+        return grid
+
+    def board_code(self):
+        """
+        布局的文本编码，按 x、y 顺序每格两个字符:
+        '..' 空格，'##' 障碍物，'G3' 表示3级 Generator
+        """
+        parts = []
         for x in range(self.size):
             for y in range(self.size):
                 cell = self.cells[x][y]
-                color = COLORS[cell.type]
-                rect = pygame.Rect(x*CELL_SIZE, y*CELL_SIZE + hud_offset, CELL_SIZE, CELL_SIZE)
-                pygame.draw.rect(screen, color, rect)
-                pygame.draw.rect(screen, (70,70,70), rect, 1)
+                if cell.is_obstacle():
+                    parts.append("##")
+                elif cell.type in TOWER_LETTERS:
+                    parts.append(f"{TOWER_LETTERS[cell.type]}{cell.level}")
+                else:
+                    parts.append("..")
+        return "".join(parts)
 
-                # 左上角等级角标
-                if cell.type in (Cell.G, Cell.A, Cell.C):
-                    font = pygame.font.SysFont(None, 18)
-                    lvl_txt = font.render(str(cell.level), True, (255, 255, 255))
-                    screen.blit(lvl_txt, (x*CELL_SIZE + 4, y*CELL_SIZE + hud_offset + 4))
+    def load_board_code(self, code):
+        if len(code) != self.size * self.size * 2:
+            raise ValueError(f"Invalid board code length: {len(code)}")
+        for i in range(self.size * self.size):
+            token = code[2 * i:2 * i + 2]
+            cell = self.cells[i // self.size][i % self.size]
+            if token == "##":
+                cell.set_obstacle()
+            elif token == "..":
+                cell.clear()
+            elif token[0] in LETTER_TOWERS:
+                cell.set_state(LETTER_TOWERS[token[0]], int(token[1]))
+            else:
+                raise ValueError(f"Invalid board code token: {token!r}")
 
-                # level display
-                if cell.type in (Cell.G, Cell.A, Cell.C):
-                    font2 = pygame.font.SysFont(None, 36, bold=True)
-                    letter = {Cell.G: 'G', Cell.A: 'A', Cell.C: 'C'}[cell.type]
-                    ttxt = font2.render(letter, True, (240, 240, 240))
+    def default_camera(self, hud_offset=60):
+        """与原固定布局一致的视口：左上角对齐，每格 CELL_SIZE 像素，显示整个棋盘"""
+        return Camera(0, hud_offset, self.size * CELL_SIZE, self.size * CELL_SIZE, CELL_SIZE, self.size)
 
-                    tx = x * CELL_SIZE + CELL_SIZE // 2 - ttxt.get_width() // 2
-                    ty = y * CELL_SIZE + hud_offset + CELL_SIZE // 2 - ttxt.get_height() // 2
+    def draw(self, screen, hud_offset=60, camera=None):
+        """只绘制视口内的格子和能量线，格子使用按缩放级别缓存的贴图"""
+        if camera is None:
+            camera = self.default_camera(hud_offset)
+        old_clip = screen.get_clip()
+        screen.set_clip(pygame.Rect(camera.view_rect))
 
-                    screen.blit(ttxt, (tx, ty))
+        size = camera.cell_size
+        x0, x1, y0, y1 = camera.visible_cells(self.size)
+        left, top = camera.to_screen(x0, y0)
+        left, top = round(left), round(top)
+        get_tile = TILES.get
+        for x in range(x0, x1):
+            column = self.cells[x]
+            px = left + (x - x0) * size
+            for y in range(y0, y1):
+                cell = column[y]
+                screen.blit(get_tile(cell.type, cell.level, size), (px, top + (y - y0) * size))
 
         # 绘制能量传播线
-        self.draw_energy_lines(screen, hud_offset)
+        self.draw_energy_lines(screen, hud_offset, camera)
+        screen.set_clip(old_clip)
 
-    def get_cell_by_pixel(self, px, py):
-        x = px // CELL_SIZE
-        y = py // CELL_SIZE
+    def get_cell_by_pixel(self, px, py, camera=None):
+        """按像素取格子；传入 camera 时 (px, py) 为屏幕坐标，否则为去掉 HUD 后的坐标"""
+        if camera is None:
+            x = px // CELL_SIZE
+            y = py // CELL_SIZE
+        else:
+            pos = camera.to_cell(px, py)
+            if pos is None:
+                return None
+            x, y = pos
         if 0 <= x < self.size and 0 <= y < self.size:
             return self.cells[x][y]
         return None
 
-    def calculate_energy_lines(self):
-        """计算所有 Generator 的能量传播路径，并计算得分"""
+    def calculate_energy_lines(self, cancelled=None):
+        """
+        计算所有 Generator 的能量传播路径，并计算得分。
+        cancelled 为可选的无参函数，每个 Generator 前检查一次，返回 True 时放弃计算并返回 None。
+        """
         self.energy_lines = []  # 存储路径段，每段为 (路径坐标点列表, 能量值)
         collected_energy = 0  # 收集的能量
         wasted_energy = 0  # 浪费的能量
         max_single_waste = 0  # 最大单次损失
         total_output = 0  # 总输出能量
 
-        for x in range(self.size):
-            for y in range(self.size):
-                cell = self.cells[x][y]
-                if cell.type == Cell.G:
-                    base_energy = cell.get_base_energy()
-                    total_output += base_energy * 4  # G向四个方向发射
-
-                    collected, wasted, segments, single_waste = self._propagate_energy(x, y, 0, 1, base_energy)   # 下
-                    collected_energy += collected
-                    wasted_energy += wasted
-                    max_single_waste = max(max_single_waste, single_waste)
-                    self.energy_lines.extend(segments)
-
-                    collected, wasted, segments, single_waste = self._propagate_energy(x, y, 0, -1, base_energy)  # 上
-                    collected_energy += collected
-                    wasted_energy += wasted
-                    max_single_waste = max(max_single_waste, single_waste)
-                    self.energy_lines.extend(segments)
-
-                    collected, wasted, segments, single_waste = self._propagate_energy(x, y, 1, 0, base_energy)   # 右
-                    collected_energy += collected
-                    wasted_energy += wasted
-                    max_single_waste = max(max_single_waste, single_waste)
-                    self.energy_lines.extend(segments)
-
-                    collected, wasted, segments, single_waste = self._propagate_energy(x, y, -1, 0, base_energy)  # 左
-                    collected_energy += collected
-                    wasted_energy += wasted
-                    max_single_waste = max(max_single_waste, single_waste)
-                    self.energy_lines.extend(segments)
+        # 只遍历 Generator，按坐标排序以保持与逐格扫描相同的累加顺序
+        for x, y in self.towers.sorted_positions(Cell.G):
+            if cancelled is not None and cancelled():
+                return None
+            cell = self.cells[x][y]
+            base_energy = cell.get_base_energy()
+            total_output += base_energy * 4  # G向四个方向发射
+
+            collected, wasted, segments, single_waste = self._propagate_energy(x, y, 0, 1, base_energy)   # 下
+            collected_energy += collected
+            wasted_energy += wasted
+            max_single_waste = max(max_single_waste, single_waste)
+            self.energy_lines.extend(segments)
+
+            collected, wasted, segments, single_waste = self._propagate_energy(x, y, 0, -1, base_energy)  # 上
+            collected_energy += collected
+            wasted_energy += wasted
+            max_single_waste = max(max_single_waste, single_waste)
+            self.energy_lines.extend(segments)
+
+            collected, wasted, segments, single_waste = self._propagate_energy(x, y, 1, 0, base_energy)   # 右
+            collected_energy += collected
+            wasted_energy += wasted
+            max_single_waste = max(max_single_waste, single_waste)
+            self.energy_lines.extend(segments)
+
+            collected, wasted, segments, single_waste = self._propagate_energy(x, y, -1, 0, base_energy)  # 左
+            collected_energy += collected
+            wasted_energy += wasted
+            max_single_waste = max(max_single_waste, single_waste)
+            self.energy_lines.extend(segments)
 
         return (collected_energy, wasted_energy, max_single_waste, total_output)
 
@@ -136,6 +265,10 @@ class Grid:
         
         current_segment = [(start_x, start_y)]
         x, y = start_x + dx, start_y + dy
+        trace = self.trace
+        length = 0  # 经过的格子数
+        amplifiers = 0  # 经过的放大器数
+        end = energy_trace.END_BOUNDARY
         
         while 0 <= x < self.size and 0 <= y < self.size:
             cell = self.cells[x][y]
@@ -149,15 +282,18 @@ class Grid:
                 # 能量没有被收集，算作浪费
                 wasted_energy += current_energy
                 max_single_waste = max(max_single_waste, current_energy)
+                end = energy_trace.END_OBSTACLE
                 break
             
             # 将当前格子加入当前段
             current_segment.append((x, y))
+            length += 1
             
             # 遇到其他塔
             if cell.type == Cell.A:
                 # 放大能量为 n 倍（使用塔的放大倍数），可穿透
                 current_energy *= cell.get_amplifier_multiplier()
+                amplifiers += 1
                 # 保存当前段（放大前的能量）
                 segments.append((current_segment, current_energy / cell.get_amplifier_multiplier()))
                 # 开始新的一段（放大后的能量）
@@ -166,6 +302,8 @@ class Grid:
                 # 收集能量，使用收集效率
                 efficiency = cell.get_collector_efficiency()
                 collected_energy += current_energy * efficiency
+                if trace is not None:
+                    trace.record_hit(x, y, current_energy, current_energy * efficiency)
                 # 如果效率小于100%，能量穿透继续传播
                 if efficiency < 1.0:
                     # 保存当前段（穿透前的能量）
@@ -177,11 +315,13 @@ class Grid:
                 else:
                     # 效率为100%或更高，能量被完全收集
                     segments.append((current_segment, current_energy))
+                    end = energy_trace.END_COLLECTOR
                     break
             elif cell.type == Cell.G:
                 # 遇到另一个 Generator，停止传播，能量不算浪费（被另一个G吸收）
                 # 保存当前段
                 segments.append((current_segment, current_energy))
+                end = energy_trace.END_GENERATOR
                 break
             
             x += dx
@@ -201,46 +341,98 @@ class Grid:
         if current_segment and not (segments and segments[-1][0] == current_segment and segments[-1][1] == current_energy):
             segments.append((current_segment, current_energy))
 
+        if trace is not None:
+            waste_boundary = wasted_energy if end == energy_trace.END_BOUNDARY else 0.0
+            waste_obstacle = wasted_energy if end == energy_trace.END_OBSTACLE else 0.0
+            trace.record_ray(start_x, start_y, dx, dy, length, amplifiers, end,
+                             base_energy, collected_energy, waste_boundary, waste_obstacle)
+
         return (collected_energy, wasted_energy, segments, max_single_waste)
 
-    def draw_energy_lines(self, screen, hud_offset=60):
-        """绘制能量传播线，根据能量值动态调整粗细"""
-        for path, energy in self.energy_lines:
+    def _tile_range(self, lo, hi):
+        """坐标区间 [lo, hi] 经过的块编号范围（含两端），超出棋盘的部分归入边上的块"""
+        last = (self.size - 1) // LINE_TILE
+        return (min(max(math.floor(lo) // LINE_TILE, 0), last),
+                min(max(math.floor(hi) // LINE_TILE, 0), last))
+
+    def line_buckets(self):
+        """
+        能量线的分块索引 {(块x, 块y): [线段下标]}，每段记入它经过的所有块。
+        energy_lines 每次计分都换成新的列表，换过之后第一次绘制时重建一次。
+        """
+        lines, buckets = self._line_index
+        if lines is self.energy_lines:
+            return buckets
+        buckets = {}
+        for i, (path, _) in enumerate(self.energy_lines):
             if len(path) < 2:
                 continue
+            (ax, ay), (bx, by) = path[0], path[-1]
+            tx0, tx1 = self._tile_range(min(ax, bx), max(ax, bx))
+            ty0, ty1 = self._tile_range(min(ay, by), max(ay, by))
+            for tx in range(tx0, tx1 + 1):
+                for ty in range(ty0, ty1 + 1):
+                    buckets.setdefault((tx, ty), []).append(i)
+        self._line_index = (self.energy_lines, buckets)
+        return buckets
+
+    def draw_energy_lines(self, screen, hud_offset=60, camera=None):
+        """绘制能量传播线，根据能量值动态调整粗细；只查看可见块中的线段（见 line_buckets）"""
+        if camera is None:
+            camera = self.default_camera(hud_offset)
+        x0, x1, y0, y1 = camera.visible_cells(self.size)
+        scale = camera.cell_size / CELL_SIZE  # 线宽随缩放变化
+        outer_color, mid_color, inner_color = ENERGY_COLORS
+
+        buckets = self.line_buckets()
+        tx0, tx1 = self._tile_range(x0 - 1, x1)
+        ty0, ty1 = self._tile_range(y0 - 1, y1)
+        visible = set()
+        for tx in range(tx0, tx1 + 1):
+            for ty in range(ty0, ty1 + 1):
+                visible.update(buckets.get((tx, ty), ()))
+
+        lines = self.energy_lines
+        for i in sorted(visible):  # 按原顺序绘制，重叠处的效果不变
+            path, energy = lines[i]
+
+            # 每段都是直线，用首尾点判断是否与可见范围相交
+            (ax, ay), (bx, by) = path[0], path[-1]
+            if max(ax, bx) < x0 - 1 or min(ax, bx) > x1 or max(ay, by) < y0 - 1 or min(ay, by) > y1:
+                continue
 
             # 将网格坐标转换为像素坐标
             points = []
             for x, y in path:
-                px = x * CELL_SIZE + CELL_SIZE // 2
-                py = y * CELL_SIZE + hud_offset + CELL_SIZE // 2
-                points.append((px, py))
+                px, py = camera.to_screen(x + 0.5, y + 0.5)
+                points.append((round(px), round(py)))
 
             # 根据能量值计算线宽（能量越大，线条越粗）
             # 能量范围大致在 30-600 之间（G的100-200经过A放大后可达600+）
             energy_factor = min(3.0, max(0.4, energy / 80.0))  # 归一化因子 0.4-3.0，变化更明显
-            outer_width = int(10 * energy_factor)
-            mid_width = int(5 * energy_factor)
-            inner_width = int(2 * energy_factor)
+            outer_width = int(10 * energy_factor * scale)
+            mid_width = int(5 * energy_factor * scale)
+            inner_width = int(2 * energy_factor * scale)
             # 确保至少有最小宽度
-            outer_width = max(outer_width, 4)
-            mid_width = max(mid_width, 2)
+            outer_width = max(outer_width, max(1, int(4 * scale)))
+            mid_width = max(mid_width, max(1, int(2 * scale)))
             inner_width = max(inner_width, 1)
 
             # 绘制能量线（使用渐变绿色发光效果）
-            if len(points) >= 2:
-                # 外发光（绿色）
-                pygame.draw.lines(screen, (50, 180, 50), False, points, outer_width)
-                # 中层（亮绿）
-                pygame.draw.lines(screen, (100, 255, 100), False, points, mid_width)
-                # 内层（高亮白）
-                pygame.draw.lines(screen, (220, 255, 220), False, points, inner_width)
-
-                # 在线段端点绘制能量光点（跳过边缘点）
-                for i, (px, py) in enumerate(points):
-                    # 检查是否是边缘点（坐标不是整数）
-                    orig_x, orig_y = path[i]
-                    if orig_x == int(orig_x) and orig_y == int(orig_y):
-                        radius = max(3, int(5 * energy_factor))
-                        pygame.draw.circle(screen, (150, 255, 150), (px, py), radius)
-                        pygame.draw.circle(screen, (255, 255, 255), (px, py), max(1, radius // 2))
+            # 外发光（绿色）
+            pygame.draw.lines(screen, outer_color, False, points, outer_width)
+            # 中层（亮绿）
+            pygame.draw.lines(screen, mid_color, False, points, mid_width)
+            # 内层（高亮白）
+            pygame.draw.lines(screen, inner_color, False, points, inner_width)
+
+            # 在线段端点绘制能量光点（跳过边缘点），缩得太小时省略
+            if camera.cell_size < 12:
+                continue
+            for i, (px, py) in enumerate(points):
+                # 检查是否是边缘点（坐标不是整数）
+                orig_x, orig_y = path[i]
+                if orig_x == int(orig_x) and orig_y == int(orig_y):
+                    radius = max(3, int(5 * energy_factor * scale))
+                    pygame.draw.circle(screen, (150, 255, 150), (px, py), radius)
+                    pygame.draw.circle(screen, (255, 255, 255), (px, py), max(1, radius // 2))
@@ -0,0 +1,152 @@
+"""
+谜题包（每日挑战）文件格式，所有整数均为小端:
+
+    文件头 (64 字节)
+        magic        4s   b"EFPK"
+        version      H
+        grid_size    H
+        record_size  I
+        count        Q    谜题数量
+        保留          44 字节
+    记录 × count（定长，第 i 条位于 64 + i * record_size）
+        seed         q    生成地图用的种子
+        par          d    参考分（求解器得分）
+        obstacles    ceil(size² / 8) 字节，第 x * size + y 位为 1 表示障碍物
+        layout       size² 字节，每格 (塔类型 << 4) | 等级，空格为 0
+
+打开时只读取文件头，之后通过 mmap 按偏移量随机访问，启动耗时与谜题数量无关。
+"""
+import mmap
+import struct
+from core.cell import Cell
+
+MAGIC = b"EFPK"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIQ44x")
+RECORD_HEAD = struct.Struct("<qd")
+
+# 布局字节中的塔类型编码
+TYPE_CODES = {Cell.G: 1, Cell.A: 2, Cell.C: 3}
+CODE_TYPES = {code: t for t, code in TYPE_CODES.items()}
+
+
+def mask_size(grid_size):
+    return (grid_size * grid_size + 7) // 8
+
+
+def record_size(grid_size):
+    return RECORD_HEAD.size + mask_size(grid_size) + grid_size * grid_size
+
+
+class Puzzle:
+    """谜题包中的一张地图"""
+
+    def __init__(self, index, grid_size, seed, par, obstacle_mask, layout_bytes):
+        self.index = index
+        self.grid_size = grid_size
+        self.seed = seed
+        self.par = par
+        self.obstacle_mask = obstacle_mask
+        self.layout_bytes = layout_bytes
+
+    def is_obstacle(self, x, y):
+        i = x * self.grid_size + y
+        return bool(self.obstacle_mask[i >> 3] & (1 << (i & 7)))
+
+    def obstacles(self):
+        return [(x, y) for x in range(self.grid_size) for y in range(self.grid_size) if self.is_obstacle(x, y)]
+
+    def best_layout(self):
+        """最佳已知布局: {(x, y): (塔类型, 等级)}"""
+        layout = {}
+        for i, b in enumerate(self.layout_bytes):
+            if b:
+                layout[(i // self.grid_size, i % self.grid_size)] = (CODE_TYPES[b >> 4], b & 0x0F)
+        return layout
+
+    def __repr__(self):
+        return f"Puzzle(index={self.index}, seed={self.seed}, par={self.par:.2f})"
+
+
+def encode_record(grid_size, seed, par, obstacles, layout):
+    """obstacles: 障碍物坐标列表；layout: {(x, y): (塔类型, 等级)}"""
+    mask = bytearray(mask_size(grid_size))
+    for x, y in obstacles:
+        i = x * grid_size + y
+        mask[i >> 3] |= 1 << (i & 7)
+    cells = bytearray(grid_size * grid_size)
+    for (x, y), (t, level) in layout.items():
+        cells[x * grid_size + y] = (TYPE_CODES[t] << 4) | level
+    return RECORD_HEAD.pack(seed, par) + bytes(mask) + bytes(cells)
+
+
+class PuzzlePackWriter:
+    """顺序写入谜题包，关闭时回填文件头中的数量"""
+
+    def __init__(self, path, grid_size):
+        self.grid_size = grid_size
+        self.record_size = record_size(grid_size)
+        self.count = 0
+        self.f = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        self.f.seek(0)
+        self.f.write(HEADER.pack(MAGIC, VERSION, self.grid_size, self.record_size, self.count))
+
+    def append(self, seed, par, obstacles, layout):
+        self.f.write(encode_record(self.grid_size, seed, par, obstacles, layout))
+        self.count += 1
+
+    def close(self):
+        self._write_header()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PuzzlePack:
+    """以 mmap 方式打开的只读谜题包，pack[i] 为 O(1) 随机访问"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.grid_size, self.record_size, self.count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a puzzle pack: {path}")
+        if version != VERSION:
+            raise ValueError(f"Unsupported puzzle pack version {version}: {path}")
+        if self.record_size != record_size(self.grid_size):
+            raise ValueError(f"Corrupt puzzle pack header: {path}")
+        if len(self.mm) < HEADER.size + self.count * self.record_size:
+            raise ValueError(f"Truncated puzzle pack: {path}")
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        offset = HEADER.size + index * self.record_size
+        seed, par = RECORD_HEAD.unpack_from(self.mm, offset)
+        offset += RECORD_HEAD.size
+        n = mask_size(self.grid_size)
+        mask = self.mm[offset:offset + n]
+        layout = self.mm[offset + n:offset + self.record_size - RECORD_HEAD.size]
+        return Puzzle(index, self.grid_size, seed, par, mask, layout)
+
+    def close(self):
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
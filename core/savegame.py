@@ -0,0 +1,289 @@
+"""
+对局存档格式，所有整数均为小端:
+
+    文件头   magic "EFSV" (4s) | version (H) | grid_size (H)
+    记录 × N kind (B) | 负载长度 (I) | 负载 | crc32(kind + 长度 + 负载) (I)
+
+第一条记录为完整快照（KIND_SNAPSHOT），之后每次操作追加一条增量（KIND_DELTA），
+只含变化的格子（由 TowerRegistry.take_changes 收集，不扫描棋盘）。两种负载都带有 AP、
+得分、calculate_energy_lines 的四项结果和当时的能量线，读档时不需要重新计算能量传播。
+读档遇到校验失败或不完整的记录（例如断电时写了一半）即停止，恢复到最后一条完整记录。
+"""
+import os
+import struct
+import zlib
+import queue
+import threading
+from core.cell import Cell
+
+MAGIC = b"EFSV"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHH")
+RECORD_HEADER = struct.Struct("<BI")
+CRC = struct.Struct("<I")
+
+KIND_SNAPSHOT = 1
+KIND_DELTA = 2
+
+# 种子、AP、选中的塔、三项得分、calculate_energy_lines 的四项结果
+STATE = struct.Struct("<qiB3d4d")
+LINES_HEADER = struct.Struct("<I")
+LINE_HEADER = struct.Struct("<dH")
+CHANGE = struct.Struct("<HHB")
+
+# 格子编码：类型码 << 4 | 等级
+TYPE_CODES = {Cell.EMPTY: 0, Cell.OBSTACLE: 1, Cell.G: 2, Cell.A: 3, Cell.C: 4}
+CODE_TYPES = {code: t for t, code in TYPE_CODES.items()}
+
+
+class SaveState:
+    """一份可存档的对局状态"""
+
+    def __init__(self, grid_size, seed, action_points, selected_tower_type, scores, totals, cells, energy_lines):
+        self.grid_size = grid_size
+        self.seed = seed
+        self.action_points = action_points
+        self.selected_tower_type = selected_tower_type
+        self.scores = scores  # (收集得分, 惩罚得分, 综合得分)
+        self.totals = totals  # Grid.calculate_energy_lines 的返回值
+        self.cells = cells  # bytearray，第 x * size + y 个字节为格子编码
+        self.energy_lines = energy_lines  # 与 Grid.energy_lines 相同的 [(路径点列表, 能量值)]
+
+    @classmethod
+    def capture(cls, game, cells=None):
+        """记录 game 的状态；cells 为调用方维护的格子编码时不再扫描棋盘"""
+        grid = game.grid
+        if cells is None:
+            cells = bytearray(grid.size * grid.size)
+            for x in range(grid.size):
+                for y in range(grid.size):
+                    cells[x * grid.size + y] = cell_code(grid.cells[x][y])
+        return cls(grid.size, grid.seed, game.action_points, game.selected_tower_type,
+                   (game.collected_score, game.penalty_score, game.final_score),
+                   game.energy_totals, cells, grid.energy_lines)
+
+    def restore(self, game):
+        """把状态写回 game（不重新计算能量传播）"""
+        grid = game.grid
+        if grid.size != self.grid_size:
+            raise ValueError(f"Save grid size {self.grid_size} does not match board size {grid.size}")
+        grid.seed = self.seed
+        if grid.puzzle is not None and grid.puzzle.seed != self.seed:
+            grid.puzzle = None  # 存档不是这张谜题
+        for x in range(grid.size):
+            for y in range(grid.size):
+                code = self.cells[x * grid.size + y]
+                grid.cells[x][y].set_state(CODE_TYPES[code >> 4], code & 0x0F)
+        grid.energy_lines = self.energy_lines
+        game.action_points = self.action_points
+        game.selected_tower_type = self.selected_tower_type
+        game.collected_score, game.penalty_score, game.final_score = self.scores
+        game.energy_totals = self.totals
+
+
+def cell_code(cell):
+    return (TYPE_CODES[cell.type] << 4) | cell.level
+
+
+def _encode_state(state):
+    return STATE.pack(state.seed, state.action_points, TYPE_CODES[state.selected_tower_type],
+                      *state.scores, *state.totals)
+
+
+def _encode_lines(lines):
+    parts = [LINES_HEADER.pack(len(lines))]
+    for path, energy in lines:
+        parts.append(LINE_HEADER.pack(energy, len(path)))
+        # 坐标可能是半格（墙壁/障碍物边缘），乘 2 后按整数存
+        parts.append(struct.pack(f"<{2 * len(path)}h", *(int(v * 2) for point in path for v in point)))
+    return b"".join(parts)
+
+
+def _decode_state(payload, offset):
+    seed, ap, selected, *values = STATE.unpack_from(payload, offset)
+    return (seed, ap, CODE_TYPES[selected], tuple(values[:3]), tuple(values[3:])), offset + STATE.size
+
+
+def _decode_lines(payload, offset):
+    (n_lines,) = LINES_HEADER.unpack_from(payload, offset)
+    offset += LINES_HEADER.size
+    lines = []
+    for _ in range(n_lines):
+        energy, n_points = LINE_HEADER.unpack_from(payload, offset)
+        offset += LINE_HEADER.size
+        coords = struct.unpack_from(f"<{2 * n_points}h", payload, offset)
+        offset += 4 * n_points
+        path = [_half(coords[i], coords[i + 1]) for i in range(0, len(coords), 2)]
+        lines.append((path, energy))
+    return lines, offset
+
+
+def _half(x2, y2):
+    # 整数坐标还原成 int，与 Grid 计算出的路径点一致
+    x = x2 // 2 if x2 % 2 == 0 else x2 / 2
+    y = y2 // 2 if y2 % 2 == 0 else y2 / 2
+    return (x, y)
+
+
+def _record(kind, payload):
+    head = RECORD_HEADER.pack(kind, len(payload))
+    return head + payload + CRC.pack(zlib.crc32(head + payload))
+
+
+def encode_snapshot(state):
+    return _record(KIND_SNAPSHOT, bytes(state.cells) + _encode_state(state) + _encode_lines(state.energy_lines))
+
+
+def encode_delta(changes, state):
+    """changes: [(格子下标, 新编码)]"""
+    parts = [struct.pack("<I", len(changes))]
+    parts.extend(CHANGE.pack(i // state.grid_size, i % state.grid_size, code) for i, code in changes)
+    parts.append(_encode_state(state))
+    parts.append(_encode_lines(state.energy_lines))
+    return _record(KIND_DELTA, b"".join(parts))
+
+
+def file_header(grid_size):
+    return FILE_HEADER.pack(MAGIC, VERSION, grid_size)
+
+
+def load(path):
+    """读取存档，返回最后一条完整记录对应的 SaveState；文件不存在或没有完整快照时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < FILE_HEADER.size:
+        return None
+    magic, version, grid_size = FILE_HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"Not a save file: {path}")
+    if version != VERSION:
+        raise ValueError(f"Unsupported save version {version}: {path}")
+
+    n_cells = grid_size * grid_size
+    state = None
+    offset = FILE_HEADER.size
+    while offset + RECORD_HEADER.size <= len(data):
+        kind, length = RECORD_HEADER.unpack_from(data, offset)
+        end = offset + RECORD_HEADER.size + length
+        if end + CRC.size > len(data):
+            break
+        (crc,) = CRC.unpack_from(data, end)
+        if crc != zlib.crc32(data[offset:end]):
+            break
+        payload = data[offset + RECORD_HEADER.size:end]
+        if kind == KIND_SNAPSHOT:
+            cells = bytearray(payload[:n_cells])
+            common, pos = _decode_state(payload, n_cells)
+            lines, _ = _decode_lines(payload, pos)
+        elif kind == KIND_DELTA and state is not None:
+            cells = bytearray(state.cells)
+            (n_changes,) = struct.unpack_from("<I", payload, 0)
+            pos = 4
+            for _ in range(n_changes):
+                x, y, code = CHANGE.unpack_from(payload, pos)
+                cells[x * grid_size + y] = code
+                pos += CHANGE.size
+            common, pos = _decode_state(payload, pos)
+            lines, _ = _decode_lines(payload, pos)
+        else:
+            break
+        state = SaveState(grid_size, *common, cells, lines)
+        offset = end + CRC.size
+    return state
+
+
+class Autosaver:
+    """
+    增量自动存档。
+    record() 在主线程只收集变化的格子（开销与操作涉及的格子数有关，与棋盘大小无关），
+    能量线的编码、写盘和 fsync 交给后台线程，不阻塞渲染循环；增量条数达到 compact_every
+    时改写为一条快照（由维护中的格子编码直接生成，写临时文件后原子替换）。
+    计分每次都生成新的能量线列表、不修改旧的，所以后台线程可以直接引用。
+    """
+
+    def __init__(self, path, compact_every=200):
+        self.path = path
+        self.compact_every = compact_every
+        self.grid = None  # 正在存档的棋盘
+        self.cells = None  # 已写入存档的格子编码，随增量更新
+        self.deltas = 0
+        self.error = None  # 最近一次写盘失败的 OSError，成功写入后清除
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    def load(self):
+        return load(self.path)
+
+    def start(self, game):
+        """扫描棋盘写入完整快照，作为之后增量的基准（开局、读档、重开时调用）"""
+        game.grid.towers.take_changes()
+        state = SaveState.capture(game)
+        self.grid = game.grid
+        self.cells = bytearray(state.cells)
+        self.deltas = 0
+        self.jobs.put(("replace", state))
+
+    def record(self, game):
+        grid = game.grid
+        if self.cells is None or grid is not self.grid:
+            self.start(game)
+            return
+        changes = []
+        for i in sorted(grid.towers.take_changes()):
+            code = cell_code(grid.cells[i // grid.size][i % grid.size])
+            if self.cells[i] != code:
+                self.cells[i] = code
+                changes.append((i, code))
+        if self.deltas >= self.compact_every:
+            self.deltas = 0
+            self.jobs.put(("replace", SaveState.capture(game, bytes(self.cells))))
+            return
+        # 增量不用格子编码，后台线程只读取状态和能量线
+        self.jobs.put(("append", (changes, SaveState.capture(game, self.cells))))
+        self.deltas += 1
+
+    def discard(self):
+        """对局结束，删除存档"""
+        self.grid = None
+        self.cells = None
+        self.jobs.put(("discard", None))
+
+    def close(self):
+        """等待后台写完"""
+        self.jobs.put(None)
+        self.thread.join()
+
+    def _writer(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            op, data = job
+            try:
+                if op == "append":
+                    data = encode_delta(*data)
+                    with open(self.path, "ab") as f:
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+                elif op == "replace":
+                    data = file_header(data.grid_size) + encode_snapshot(data)
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    tmp_path = self.path + ".tmp"
+                    with open(tmp_path, "wb") as f:
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self.path)
+                elif os.path.exists(self.path):
+                    os.remove(self.path)
+                self.error = None
+            except OSError as e:
+                # 存档失败不应影响游戏，只记录原因
+                self.error = e
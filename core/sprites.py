@@ -0,0 +1,73 @@
+import hashlib
+import pygame
+from core.cell import Cell
+
+# 视觉主题，修改后请递增 THEME_VERSION 以使缩略图缓存失效
+THEME_VERSION = 1
+
+COLORS = {
+    Cell.EMPTY: (40, 40, 40),
+    Cell.OBSTACLE: (100, 100, 100),
+    Cell.G: (80, 160, 80),
+    Cell.A: (80, 80, 180),
+    Cell.C: (180, 120, 60),
+}
+BORDER_COLOR = (70, 70, 70)
+TEXT_COLOR = (240, 240, 240)
+LEVEL_COLOR = (255, 255, 255)
+# 能量线由外到内的三层颜色
+ENERGY_COLORS = ((50, 180, 50), (100, 255, 100), (220, 255, 220))
+
+LETTERS = {Cell.G: 'G', Cell.A: 'A', Cell.C: 'C'}
+
+
+def theme_hash():
+    """当前视觉主题的摘要，用作渲染缓存的一部分键"""
+    theme = (THEME_VERSION, sorted(COLORS.items()), BORDER_COLOR, TEXT_COLOR, LEVEL_COLOR, ENERGY_COLORS)
+    return hashlib.sha1(repr(theme).encode("utf-8")).hexdigest()[:12]
+
+
+class TileCache:
+    """按 (类型, 等级, 边长) 缓存预渲染的格子贴图，字体也按字号缓存"""
+
+    def __init__(self):
+        self.tiles = {}
+        self.fonts = {}
+
+    def font(self, size, bold=False):
+        key = (size, bold)
+        font = self.fonts.get(key)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = pygame.font.SysFont(None, size, bold=bold)
+            self.fonts[key] = font
+        return font
+
+    def get(self, cell_type, level, size):
+        key = (cell_type, level if cell_type in LETTERS else 0, size)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self._render(cell_type, level, size)
+            self.tiles[key] = tile
+        return tile
+
+    def _render(self, cell_type, level, size):
+        tile = pygame.Surface((size, size))
+        tile.fill(COLORS[cell_type])
+        if size >= 6:
+            pygame.draw.rect(tile, BORDER_COLOR, tile.get_rect(), 1)
+
+        # 太小的格子不画文字
+        if cell_type in LETTERS and size >= 20:
+            # 左上角等级角标（以 70 像素格子为基准缩放字号）
+            lvl_txt = self.font(max(8, size * 18 // 70)).render(str(level), True, LEVEL_COLOR)
+            tile.blit(lvl_txt, (size * 4 // 70, size * 4 // 70))
+
+            ttxt = self.font(max(10, size * 36 // 70), bold=True).render(LETTERS[cell_type], True, TEXT_COLOR)
+            tile.blit(ttxt, (size // 2 - ttxt.get_width() // 2, size // 2 - ttxt.get_height() // 2))
+        return tile
+
+
+# 进程内共享的贴图缓存
+TILES = TileCache()
@@ -0,0 +1,124 @@
+from array import array
+from core.cell import Cell
+
+TOWER_KINDS = (Cell.G, Cell.A, Cell.C)
+
+
+class TowerList:
+    """同一类型的塔：坐标和等级存放在平行数组中，删除时用末尾元素填补空位"""
+
+    def __init__(self):
+        self.xs = array("h")
+        self.ys = array("h")
+        self.levels = array("b")
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __iter__(self):
+        """(x, y, 等级)，顺序与放置/删除的历史有关"""
+        return zip(self.xs, self.ys, self.levels)
+
+    def positions(self):
+        return zip(self.xs, self.ys)
+
+    def copy(self):
+        towers = TowerList.__new__(TowerList)
+        towers.xs = self.xs[:]
+        towers.ys = self.ys[:]
+        towers.levels = self.levels[:]
+        return towers
+
+    def append(self, x, y, level):
+        self.xs.append(x)
+        self.ys.append(y)
+        self.levels.append(level)
+        return len(self.xs) - 1
+
+    def swap_remove(self, i):
+        """删除第 i 个，返回被移到第 i 位的原末尾元素坐标（删除的就是末尾时返回 None）"""
+        last = len(self.xs) - 1
+        moved = None
+        if i != last:
+            self.xs[i] = self.xs[last]
+            self.ys[i] = self.ys[last]
+            self.levels[i] = self.levels[last]
+            moved = (self.xs[i], self.ys[i])
+        self.xs.pop()
+        self.ys.pop()
+        self.levels.pop()
+        return moved
+
+
+class TowerRegistry:
+    """
+    棋盘上所有塔的索引，按类型分组（见 TowerList）。
+    slots 记录每个格子在所属列表中的下标（-1 表示不是塔），增删改都是 O(1)。
+    由 Cell 的 set_tower / upgrade / clear / set_state 维护，计分、渲染和分析
+    只需遍历塔，不必扫描整个棋盘。
+    Cell.set_state 是格子的唯一修改入口，所以这里也顺带记录变化过的格子（含障碍物），
+    自动存档用 take_changes() 取出后只写这些格子的增量；obstacles 是障碍物位图，
+    供 Grid.snapshot() 的副本只读共享。
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.lists = {t: TowerList() for t in TOWER_KINDS}
+        self.slots = array("i", [-1]) * (size * size)
+        self.obstacles = bytearray(size * size)  # 1 表示障碍物
+        self.changed = set()  # 自上次 take_changes() 以来变化过的格子下标 x * size + y
+
+    def __len__(self):
+        return sum(len(towers) for towers in self.lists.values())
+
+    def __iter__(self):
+        """(类型, x, y, 等级)"""
+        for t, towers in self.lists.items():
+            for x, y, level in towers:
+                yield t, x, y, level
+
+    def frozen(self):
+        """
+        只读副本：只复制塔列表，开销与塔数有关、与棋盘大小无关。
+        slots 和 obstacles 与原索引共享，副本不能再修改（障碍物只在生成和读档时变化）。
+        """
+        registry = TowerRegistry.__new__(TowerRegistry)
+        registry.size = self.size
+        registry.lists = {t: towers.copy() for t, towers in self.lists.items()}
+        registry.slots = self.slots
+        registry.obstacles = self.obstacles
+        registry.changed = set()
+        return registry
+
+    def of(self, t):
+        return self.lists[t]
+
+    def count(self, t=None):
+        return len(self) if t is None else len(self.lists[t])
+
+    def sorted_positions(self, t):
+        """按 x、y 排序的坐标，与逐格扫描棋盘的顺序相同，保证结果不受放置顺序影响"""
+        return sorted(self.lists[t].positions())
+
+    def take_changes(self):
+        """取出并清空变化记录，返回格子下标的集合"""
+        changed, self.changed = self.changed, set()
+        return changed
+
+    def update(self, x, y, old_type, new_type, level):
+        """格子 (x, y) 从 old_type 变为 new_type（等级 level）"""
+        index = x * self.size + y
+        self.changed.add(index)
+        if new_type == Cell.OBSTACLE or old_type == Cell.OBSTACLE:
+            self.obstacles[index] = new_type == Cell.OBSTACLE
+        if old_type == new_type:
+            if new_type in self.lists:
+                self.lists[new_type].levels[self.slots[index]] = level
+            return
+        if old_type in self.lists:
+            moved = self.lists[old_type].swap_remove(self.slots[index])
+            if moved is not None:
+                self.slots[moved[0] * self.size + moved[1]] = self.slots[index]
+            self.slots[index] = -1
+        if new_type in self.lists:
+            self.slots[index] = self.lists[new_type].append(x, y, level)
@@ -0,0 +1,297 @@
+import os
+import sys
+import time
+import struct
+from array import array
+
+# 列定义：(列名, array 类型码)
+RAY_COLUMNS = (
+    ("game", "i"),            # 第几局
+    ("action", "i"),          # 该局第几次计分（每次放置/升级/移除）
+    ("src_x", "h"),           # 发生器坐标
+    ("src_y", "h"),
+    ("dx", "b"),              # 传播方向
+    ("dy", "b"),
+    ("length", "h"),          # 路径长度（经过的格子数）
+    ("amplifiers", "h"),      # 经过的放大器数量
+    ("end", "b"),             # 终止原因，见 END_*
+    ("emitted", "d"),         # 发射能量
+    ("collected", "d"),       # 被收集的能量
+    ("waste_boundary", "d"),  # 撞墙浪费
+    ("waste_obstacle", "d"),  # 撞障碍物浪费
+)
+
+HIT_COLUMNS = (
+    ("game", "i"),
+    ("action", "i"),
+    ("ray", "i"),             # 对应 rays 表中的全局行号
+    ("x", "h"),               # 收集器坐标
+    ("y", "h"),
+    ("energy_in", "d"),       # 到达收集器时的能量
+    ("collected", "d"),       # 收集器收下的能量
+)
+
+END_BOUNDARY = 0
+END_OBSTACLE = 1
+END_GENERATOR = 2
+END_COLLECTOR = 3
+
+FORMATS = ("npy", "csv", "cols")
+
+_NPY_DESCR = {"b": "i1", "h": "i2", "i": "i4", "d": "f8"}
+_NPY_HEADER_LEN = 128  # 预留固定长度的头部，追加数据时原地改写 shape
+_COLS_MAGIC = b"EFC1"
+
+
+class ColumnBuffer:
+    """一组预分配的定长列，写满后由 EnergyTrace 批量落盘"""
+
+    def __init__(self, columns, capacity):
+        self.columns = columns
+        self.capacity = capacity
+        self.count = 0
+        self.data = [array(code, bytes(array(code).itemsize * capacity)) for _, code in columns]
+
+    def is_full(self):
+        return self.count >= self.capacity
+
+    def grow(self):
+        """容量翻倍（原地扩展各列，已有的引用仍然有效）"""
+        for (_, code), col in zip(self.columns, self.data):
+            col.extend(array(code, bytes(col.itemsize * self.capacity)))
+        self.capacity *= 2
+
+    def clear(self):
+        self.count = 0
+
+    def view(self, i):
+        """返回第 i 列已写入部分的字节视图（不复制）"""
+        col = self.data[i]
+        return memoryview(col)[:self.count]
+
+
+class EnergyTrace:
+    """
+    逐射线能量流遥测。
+    数据写入预分配的列式缓冲区，缓冲区满或调用 flush() 时批量写出，
+    记录过程不为每条射线创建 Python 对象，可在正式对局中常开。
+    每个进程写入 out_dir 下自己的子目录 run-<启动时间>-<进程号>（run_dir），
+    重启不会覆盖之前的记录；局号在每个子目录内从 0 开始。
+    """
+
+    def __init__(self, out_dir, fmt="npy", capacity=4096):
+        if fmt not in FORMATS:
+            raise ValueError(f"Invalid trace format: {fmt}")
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.rays = ColumnBuffer(RAY_COLUMNS, capacity)
+        self.hits = ColumnBuffer(HIT_COLUMNS, capacity)
+        self.game = -1
+        self.action = 0
+        self.ray_count = 0     # 已记录的射线总数（含已落盘的）
+        self.rows_written = {"rays": 0, "hits": 0}
+        self.run_dir = os.path.join(out_dir, time.strftime("run-%Y%m%d-%H%M%S") + f"-{os.getpid()}")
+        os.makedirs(self.run_dir, exist_ok=True)
+
+    def begin_game(self):
+        self.game += 1
+        self.action = 0
+
+    def begin_action(self):
+        self.action += 1
+
+    def record_hit(self, x, y, energy_in, collected):
+        """记录一次收集器命中，属于下一条调用 record_ray 的射线"""
+        buf = self.hits
+        if buf.is_full():
+            self._flush_table("hits", buf)
+        i = buf.count
+        d = buf.data
+        d[0][i] = self.game
+        d[1][i] = self.action
+        d[2][i] = self.ray_count
+        d[3][i] = x
+        d[4][i] = y
+        d[5][i] = energy_in
+        d[6][i] = collected
+        buf.count = i + 1
+
+    def record_ray(self, src_x, src_y, dx, dy, length, amplifiers, end,
+                   emitted, collected, waste_boundary, waste_obstacle):
+        buf = self.rays
+        if buf.is_full():
+            self._flush_table("rays", buf)
+        i = buf.count
+        d = buf.data
+        d[0][i] = self.game
+        d[1][i] = self.action
+        d[2][i] = src_x
+        d[3][i] = src_y
+        d[4][i] = dx
+        d[5][i] = dy
+        d[6][i] = length
+        d[7][i] = amplifiers
+        d[8][i] = end
+        d[9][i] = emitted
+        d[10][i] = collected
+        d[11][i] = waste_boundary
+        d[12][i] = waste_obstacle
+        buf.count = i + 1
+        self.ray_count += 1
+
+    def job(self):
+        """给后台计分任务用的独立缓冲区（见 TraceJob）"""
+        return TraceJob()
+
+    def commit(self, job):
+        """
+        写入一个被采纳的计分任务的记录（与 begin_game 一样只在主线程调用）。
+        局号、计分序号和射线编号在这里分配，被取代的任务不会留下任何记录。
+        """
+        self.begin_action()
+        fixed = {"game": self.game, "action": self.action}
+        self._append_rows("hits", self.hits, job.hits, fixed, self.ray_count)
+        self._append_rows("rays", self.rays, job.rays, fixed, 0)
+        self.ray_count += job.ray_count
+
+    def _append_rows(self, table, buf, src, fixed, ray_base):
+        start = 0
+        while start < src.count:
+            if buf.is_full():
+                self._flush_table(table, buf)
+            n = min(src.count - start, buf.capacity - buf.count)
+            end = buf.count + n
+            for (name, code), col, src_col in zip(buf.columns, buf.data, src.data):
+                if name in fixed:
+                    col[buf.count:end] = array(code, [fixed[name]]) * n
+                elif name == "ray":
+                    col[buf.count:end] = array(code, (v + ray_base for v in src_col[start:start + n]))
+                else:
+                    col[buf.count:end] = src_col[start:start + n]
+            buf.count = end
+            start += n
+
+    def flush(self):
+        """把缓冲区中的数据全部写出"""
+        self._flush_table("rays", self.rays)
+        self._flush_table("hits", self.hits)
+
+    def close(self):
+        self.flush()
+
+    # ---------- 落盘 ----------
+
+    def _flush_table(self, table, buf):
+        if buf.count == 0:
+            return
+        if self.fmt == "npy":
+            self._write_npy(table, buf)
+        elif self.fmt == "csv":
+            self._write_csv(table, buf)
+        else:
+            self._write_cols(table, buf)
+        self.rows_written[table] += buf.count
+        buf.clear()
+
+    def _write_npy(self, table, buf):
+        """每列一个 .npy 文件，追加数据后改写头部中的 shape"""
+        total = self.rows_written[table] + buf.count
+        for i, (name, code) in enumerate(buf.columns):
+            path = os.path.join(self.run_dir, f"{table}.{name}.npy")
+            mode = "r+b" if os.path.exists(path) and self.rows_written[table] > 0 else "wb"
+            with open(path, mode) as f:
+                f.write(_npy_header(code, total))
+                f.seek(0, os.SEEK_END)
+                f.write(_native_to_le(buf, i))
+
+    def _write_csv(self, table, buf):
+        path = os.path.join(self.run_dir, f"{table}.csv")
+        new_file = self.rows_written[table] == 0
+        with open(path, "w" if new_file else "a", encoding="utf-8") as f:
+            if new_file:
+                f.write(",".join(name for name, _ in buf.columns) + "\n")
+            cols = buf.data
+            for r in range(buf.count):
+                f.write(",".join(str(col[r]) for col in cols) + "\n")
+
+    def _write_cols(self, table, buf):
+        path = os.path.join(self.run_dir, f"{table}.efc")
+        append_row_group(path, buf, new_file=self.rows_written[table] == 0)
+
+
+class TraceJob(EnergyTrace):
+    """
+    一次后台计分的遥测记录，记录接口与 EnergyTrace 相同。
+    数据只写进任务自己的列（写满时扩容，不落盘），计分结果被采纳后由
+    EnergyTrace.commit 在主线程并入；被新任务取代的结果连同记录一起丢弃。
+    """
+
+    def __init__(self, capacity=256):
+        self.rays = ColumnBuffer(RAY_COLUMNS, capacity)
+        self.hits = ColumnBuffer(HIT_COLUMNS, capacity)
+        self.game = 0
+        self.action = 0
+        self.ray_count = 0  # 任务内的射线编号，commit 时加上全局偏移
+
+    def _flush_table(self, table, buf):
+        buf.grow()
+
+
+def _npy_header(code, rows):
+    descr = "|i1" if code == "b" else "<" + _NPY_DESCR[code]
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (descr, rows)
+    # 魔数(6) + 版本(2) + 长度(2) + 头部，总长补齐到 _NPY_HEADER_LEN
+    header = header.ljust(_NPY_HEADER_LEN - 10 - 1) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def _native_to_le(buf, i):
+    if sys.byteorder == "little":
+        return buf.view(i).tobytes()
+    col = array(buf.data[i].typecode, buf.view(i))
+    col.byteswap()
+    return col.tobytes()
+
+
+def append_row_group(path, buf, new_file=False, fsync=False):
+    """
+    简易列式文件（.efc），结构类似 Parquet 的行组：
+    文件头 = 魔数 + 列定义，之后每次落盘追加一个行组 = 魔数 + 行数 + 各列连续的小端字节。
+    fsync=True 时写完后同步到磁盘（需要断点续跑的调用方使用）。返回写入后的文件长度。
+    """
+    with open(path, "wb" if new_file or not os.path.exists(path) else "ab") as f:
+        if f.tell() == 0:
+            schema = ",".join(f"{name}:{code}" for name, code in buf.columns).encode("ascii")
+            f.write(_COLS_MAGIC + struct.pack("<I", len(schema)) + schema)
+        f.write(_COLS_MAGIC + struct.pack("<I", buf.count))
+        for i in range(len(buf.columns)):
+            f.write(_native_to_le(buf, i))
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+        return f.tell()
+
+
+def read_columns(path):
+    """读取 .efc 列式文件，返回 {列名: array}"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    if raw[:4] != _COLS_MAGIC:
+        raise ValueError(f"Not a trace column file: {path}")
+    (schema_len,) = struct.unpack_from("<I", raw, 4)
+    pos = 8 + schema_len
+    columns = [tuple(item.split(":")) for item in raw[8:pos].decode("ascii").split(",")]
+    result = {name: array(code) for name, code in columns}
+    while pos < len(raw):
+        if raw[pos:pos + 4] != _COLS_MAGIC:
+            raise ValueError(f"Corrupt row group at offset {pos}: {path}")
+        (rows,) = struct.unpack_from("<I", raw, pos + 4)
+        pos += 8
+        for name, code in columns:
+            size = array(code).itemsize * rows
+            col = array(code, raw[pos:pos + size])
+            if sys.byteorder != "little":
+                col.byteswap()
+            result[name].extend(col)
+            pos += size
+    return result
@@ -0,0 +1,97 @@
+import threading
+import functools
+
+
+class ComputeWorker:
+    """
+    后台计算线程。
+    每个任务有一个键（如 "score"）和一个全局递增的版本号；同一个键提交新任务时，
+    尚未开始的旧任务直接丢弃，正在运行的旧任务结束后其结果也会被丢弃。
+    主循环每帧调用 poll() 取回已完成的最新结果，不会被计算阻塞。
+    任务以 fn(*args, cancelled=...) 调用，cancelled() 返回 True 表示已被同一个键的新任务
+    取代，耗时较长的任务应定期检查并提前返回（返回值会被丢弃）。
+    线程每次醒来取走当时所有待算的任务成批计算，结果一起发布；多个对局共用
+    一个 worker 时（见 session.py），同一帧内的计分请求只需一次线程切换。
+    """
+
+    def __init__(self):
+        self.lock = threading.Condition()
+        self.version = 0
+        self.latest = {}  # 键 -> 最新提交的版本号
+        self.pending = {}  # 键 -> (版本号, 函数, 参数)，每个键只保留最新的一个
+        self.finished = {}  # 键 -> (版本号, 结果)
+        self.running = {}  # 当前批次中尚未发布结果的 键 -> 版本号
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, key, fn, *args):
+        """提交任务，返回版本号"""
+        with self.lock:
+            self.version += 1
+            self.latest[key] = self.version
+            self.pending[key] = (self.version, fn, args)
+            self.finished.pop(key, None)
+            self.lock.notify_all()
+            return self.version
+
+    def forget(self, key):
+        """丢弃该键的所有状态（键不再使用时调用，如会话结束）；正在运行的任务结果也会被丢弃"""
+        with self.lock:
+            self.latest.pop(key, None)
+            self.pending.pop(key, None)
+            self.finished.pop(key, None)
+            self.lock.notify_all()
+
+    def is_current(self, key, version):
+        with self.lock:
+            return self.latest.get(key) == version
+
+    def poll(self):
+        """取回所有已完成的最新结果: [(键, 版本号, 结果)]，异常以异常对象作为结果返回"""
+        with self.lock:
+            if not self.finished:
+                return []
+            results = [(key, version, result) for key, (version, result) in self.finished.items()]
+            self.finished.clear()
+            return results
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.pending.clear()
+            self.lock.notify_all()
+        self.thread.join()
+
+    def _superseded(self, key, version):
+        return not self.is_current(key, version)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self.pending and not self.closed:
+                    self.lock.wait()
+                if self.closed:
+                    return
+                # 先提交的键先算
+                batch = sorted(((version, key, fn, args) for key, (version, fn, args) in self.pending.items()),
+                               key=lambda job: job[0])
+                self.pending.clear()
+                self.running = {key: version for version, key, _, _ in batch}
+
+            results = []
+            for version, key, fn, args in batch:
+                if not self.is_current(key, version):
+                    continue  # 批次开始后已被新任务取代
+                try:
+                    result = fn(*args, cancelled=functools.partial(self._superseded, key, version))
+                except Exception as e:  # 结果交给主线程处理
+                    result = e
+                results.append((key, version, result))
+
+            with self.lock:
+                self.running = {}
+                for key, version, result in results:
+                    if self.latest.get(key) == version:
+                        self.finished[key] = (version, result)
+                self.lock.notify_all()
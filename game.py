@@ -4,6 +4,9 @@ import os
 from datetime import datetime
 from core.grid import Grid
 from core.cell import Cell
+from core.camera import Camera
+from core.balance import DEFAULT_BALANCE
+from render.thumbnails import render_board, pack_layout, unpack_layout
 
 CELL = 70
 HUD_H = 30
@@ -11,16 +14,108 @@ HUD_LINES = 2
 WIDTH = 8 * CELL
 HEIGHT = 8 * CELL + HUD_H * HUD_LINES
 LEADERBOARD_FILE = ".codebuddy/leaderboard.json"
+AUTOSAVE_FILE = ".codebuddy/autosave.efs"
 RESTART_BTN_RECT = (WIDTH - 90, 5, 80, 20)  # 重新开始按钮区域
+TOWER_TYPES = (Cell.G, Cell.A, Cell.C)
+
+# 同一进程内所有对局共用的字体和排行榜缩略图（见 load_fonts、draw_leaderboard）
+_FONTS = {}
+THUMBNAILS = {}
+
+
+def compute_energy(grid, trace=None, cancelled=None):
+    """
+    计算能量传播，返回 (calculate_energy_lines 的结果, 能量线)，可在后台线程运行。
+    cancelled 见 ComputeWorker，任务被取代时提前返回 None。
+    """
+    if trace is not None:
+        trace.begin_action()
+    totals = grid.calculate_energy_lines(cancelled)
+    if totals is None:
+        return None
+    return totals, grid.energy_lines
+
+
+def score_energy(collected, wasted, max_single_waste, total_output, balance=DEFAULT_BALANCE):
+    """
+    根据能量传播结果计算得分
+    返回: (收集得分, 惩罚得分, 综合得分)
+    """
+    penalty = balance.penalty(wasted, max_single_waste, total_output)
+    return collected, penalty, collected - penalty
+
+
+def load_fonts():
+    """
+    探测可显示中文的字体，返回 {"text", "title", "hud"}。
+    结果在进程内缓存，多个对局（见 session.py）共用同一组字体对象。
+    """
+    if _FONTS:
+        return _FONTS
+    # 尝试常见的中文字体
+    font_names = [
+        "simhei",  # 黑体
+        "simsun",  # 宋体
+        "microsoftyahei",  # 微软雅黑
+        "pingfangsc",  # 苹方（macOS）
+        "heiti",  # 黑体（macOS）
+        "stheitilight",  # 华文黑体（macOS）
+        "arialunicode",  # Arial Unicode
+    ]
+    _FONTS["hud"] = pygame.font.SysFont(None, 24)
+
+    # 在 macOS 上使用系统字体
+    import platform
+    if platform.system() == "Darwin":  # macOS
+        font_paths = [
+            "/System/Library/Fonts/PingFang.ttc",
+            "/System/Library/Fonts/STHeiti Light.ttc",
+            "/System/Library/Fonts/Arial Unicode.ttf",
+        ]
+        for font_path in font_paths:
+            if os.path.exists(font_path):
+                _FONTS["text"] = pygame.font.Font(font_path, 24)
+                _FONTS["title"] = pygame.font.Font(font_path, 40)
+                return _FONTS
+
+    # 尝试系统字体
+    for font_name in font_names:
+        try:
+            _FONTS["text"] = pygame.font.SysFont(font_name, 24)
+            _FONTS["title"] = pygame.font.SysFont(font_name, 40)
+            # 测试是否能显示中文
+            test = _FONTS["text"].render("测试", True, (255, 255, 255))
+            return _FONTS
+        except:
+            continue
+
+    # 如果都失败，使用默认字体
+    _FONTS["text"] = pygame.font.SysFont(None, 24)
+    _FONTS["title"] = pygame.font.SysFont(None, 40)
+    return _FONTS
+
 
 class Game:
-    def __init__(self, screen):
-        self.screen = screen
-        self.grid = Grid()
-        self.action_points = 100
+    def __init__(self, screen, trace=None, seed=None, puzzle=None, balance=None, autosaver=None, worker=None,
+                 size=None, score_key="score"):
+        self.screen = screen  # 为 None 时为无界面模式（机器人对局、批量模拟）
+        self.trace = trace  # 可选的能量流遥测，见 core/trace.py
+        self.puzzle = puzzle  # 每日挑战地图，见 core/puzzle_pack.py
+        self.balance = balance or DEFAULT_BALANCE  # 数值参数，见 core/balance.py
+        self.board_size = size  # 沙盒模式的棋盘边长，None 为默认 8×8
+        self.grid = Grid(trace=trace, seed=seed, puzzle=puzzle, balance=balance, size=size)
+        # 棋盘视口，支持平移和缩放，默认与原固定布局一致
+        self.camera = Camera(0, HUD_H * HUD_LINES, WIDTH, HEIGHT - HUD_H * HUD_LINES, CELL, self.grid.size)
+        self.dragging = False  # 右键拖动平移中
+        self.action_points = self.balance.start_ap
         self.collected_score = 0  # 收集的能量得分
         self.penalty_score = 0  # 惩罚得分
         self.final_score = 0  # 综合得分
+        self.energy_totals = (0, 0, 0, 0)  # 最近一次 calculate_energy_lines 的结果
+        self.worker = worker  # 后台计算线程（core/worker.py），None 时同步计分
+        self.score_key = score_key  # 提交计分任务的键，多个对局共用一个 worker 时各不相同
+        self.score_version = None  # 最近提交的计分任务版本，None 表示没有未完成的计分
+        self.score_trace = None  # 最近提交的计分任务的遥测缓冲（core.trace.TraceJob）
         self.selected_tower_type = Cell.G
         self.last_click_time = 0
         self.double_click_time_threshold = 300
@@ -28,54 +123,39 @@ class Game:
         self.player_name = ""
         self.max_name_length = 10
         self.cached_leaderboard = None  # 缓存排行榜数据
+        self.thumbnails = THUMBNAILS  # 排行榜缩略图缓存 {布局编码: Surface}，所有对局共用
         self.needs_redraw = True  # 是否需要重绘
+        self.cursor_phase = None  # 名字输入框光标的闪烁相位
+        self.shown_autosave_status = None  # HUD 上正在显示的自动存档问题（见 autosave_status）
         self.previous_grid = None  # 保存上一局的grid状态
         self.previous_scores = None  # 保存上一局的分数
 
         # 初始化中文字体
-        self.init_chinese_font()
+        if screen is not None:
+            self.init_chinese_font()
 
-    def init_chinese_font(self):
-        """初始化中文字体"""
-        # 尝试常见的中文字体
-        font_names = [
-            "simhei",  # 黑体
-            "simsun",  # 宋体
-            "microsoftyahei",  # 微软雅黑
-            "pingfangsc",  # 苹方（macOS）
-            "heiti",  # 黑体（macOS）
-            "stheitilight",  # 华文黑体（macOS）
-            "arialunicode",  # Arial Unicode
-        ]
-        
-        # 在 macOS 上使用系统字体
-        import platform
-        if platform.system() == "Darwin":  # macOS
-            font_paths = [
-                "/System/Library/Fonts/PingFang.ttc",
-                "/System/Library/Fonts/STHeiti Light.ttc",
-                "/System/Library/Fonts/Arial Unicode.ttf",
-            ]
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    self.chinese_font = pygame.font.Font(font_path, 24)
-                    self.chinese_font_title = pygame.font.Font(font_path, 40)
-                    return
-        
-        # 尝试系统字体
-        for font_name in font_names:
+        # 自动存档（core/savegame.py），有未完成的对局时直接恢复
+        self.autosaver = autosaver
+        self.autosave_error = None  # 读档失败的原因（旧版本、损坏或无法读取的存档会被忽略）
+        if autosaver is not None:
             try:
-                self.chinese_font = pygame.font.SysFont(font_name, 24)
-                self.chinese_font_title = pygame.font.SysFont(font_name, 40)
-                # 测试是否能显示中文
-                test = self.chinese_font.render("测试", True, (255, 255, 255))
-                return
-            except:
-                continue
-        
-        # 如果都失败，使用默认字体
-        self.chinese_font = pygame.font.SysFont(None, 24)
-        self.chinese_font_title = pygame.font.SysFont(None, 40)
+                state = autosaver.load()
+            except (ValueError, OSError) as e:
+                self.autosave_error = e
+                state = None
+            if state is not None and state.grid_size == self.grid.size:
+                state.restore(self)
+            # 存档可能停在用完 AP 的最后一步（结束时删除存档之前断电或删除失败），直接进入结算
+            self.check_game_over()
+            if self.game_state == "playing":
+                autosaver.start(self)
+
+    def init_chinese_font(self):
+        """初始化中文字体（进程内共用，见 load_fonts）"""
+        fonts = load_fonts()
+        self.chinese_font = fonts["text"]
+        self.chinese_font_title = fonts["title"]
+        self.hud_font = fonts["hud"]
 
     def load_leaderboard(self):
         """加载排行榜数据"""
@@ -93,8 +173,11 @@ class Game:
         entry = {
             "name": name,
             "score": self.final_score,
-            "date": datetime.now().strftime("%Y-%m-%d")  # 只显示年月日
+            "date": datetime.now().strftime("%Y-%m-%d"),  # 只显示年月日
         }
+        layout = pack_layout(self.grid.board_code())  # 用于排行榜缩略图，太大的棋盘不保存
+        if layout is not None:
+            entry["layout"] = layout
         leaderboard.append(entry)
         # 按分数降序排序，保留前10
         leaderboard.sort(key=lambda x: x["score"], reverse=True)
@@ -221,6 +304,15 @@ class Game:
             self.screen.blit(name, (header_x[1], y))
             self.screen.blit(score, (header_x[2], y))
             self.screen.blit(date, (header_x[3], y))
+
+            # 布局缩略图（旧记录和太大的棋盘没有 layout 字段），边长固定为 GRID_SIZE × 3 像素
+            layout = entry.get("layout")
+            if layout:
+                thumb = self.thumbnails.get(layout)
+                if thumb is None:
+                    thumb = render_board(unpack_layout(layout), 3)
+                    self.thumbnails[layout] = thumb
+                self.screen.blit(thumb, (dialog_x + dialog_w - 20 - thumb.get_width(), y - 2))
         
         # 按钮
         btn_w, btn_h = 120, 40
@@ -280,7 +372,9 @@ class Game:
         
         if btn1_x <= x <= btn1_x + btn_w and btn_y <= y <= btn_y + btn_h:
             # 再玩一局
-            self.__init__(self.screen)
+            self.__init__(self.screen, self.trace, puzzle=self.puzzle, balance=self.balance,
+                          autosaver=self.autosaver, worker=self.worker, size=self.board_size,
+                          score_key=self.score_key)
             self.needs_redraw = True
         elif btn2_x <= x <= btn2_x + btn_w and btn_y <= y <= btn_y + btn_h:
             # 结束游戏
@@ -289,165 +383,283 @@ class Game:
 
     def run(self):
         clock = pygame.time.Clock()
-        running = True
-        while running:
+        while True:
             clock.tick(60)
-
-            if self.game_state == "playing":
-                running = self.handle_events()
+            self.poll_compute()
+            mouse_pos = pygame.mouse.get_pos()
+            for event in pygame.event.get():
+                if not self.handle_event(event, mouse_pos):
+                    return False
+            if self.wants_redraw():
                 self.render()
-            elif self.game_state == "name_input":
-                # 名字输入状态需要持续渲染（光标闪烁）
-                btn_rect = None
-
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        return False
-                    if event.type == pygame.KEYDOWN:
-                        old_name = self.player_name
-                        self.handle_name_input(event)
-                        if self.player_name != old_name or self.game_state == "leaderboard":
-                            self.needs_redraw = True
-                    elif event.type == pygame.MOUSEBUTTONDOWN:
-                        # 检查是否点击确认按钮
-                        btn_rect = self.draw_name_input()
-                        if btn_rect:
-                            x, y = event.pos
-                            if btn_rect[0] <= x <= btn_rect[0] + btn_rect[2] and btn_rect[1] <= y <= btn_rect[1] + btn_rect[3]:
-                                if self.player_name:
-                                    self.save_score(self.player_name)
-                                    self.cached_leaderboard = self.load_leaderboard()
-                                    self.game_state = "leaderboard"
-                                    self.needs_redraw = True
-
-                # 持续渲染以显示光标闪烁
-                self.screen.fill((20, 20, 20))
-                self.grid.draw(self.screen, HUD_H * HUD_LINES)
-                self.draw_name_input()
-                pygame.display.flip()
-            elif self.game_state == "leaderboard":
-                # 排行榜状态只在需要重绘时渲染
-                if self.needs_redraw:
-                    self.screen.fill((20, 20, 20))
-                    self.grid.draw(self.screen, HUD_H * HUD_LINES)
-                    self.draw_leaderboard()
-                    pygame.display.flip()
-                    self.needs_redraw = False
-
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        return False
-                    elif event.type == pygame.MOUSEBUTTONDOWN:
-                        if not self.handle_leaderboard_click(event.pos):
-                            return False
-            elif self.game_state == "viewing_result":
-                # 查看上一局结果状态，玩家无法操作
-                if self.needs_redraw:
-                    self.screen.fill((20, 20, 20))
-                    self.grid.draw(self.screen, HUD_H * HUD_LINES)
-                    self.draw_hud()
-                    pygame.display.flip()
-                    self.needs_redraw = False
-
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        return False
-                    elif event.type == pygame.MOUSEBUTTONDOWN:
-                        # 检查是否点击重开按钮
-                        if self.handle_restart_click(event.pos):
-                            return True
-
-    def handle_events(self):
-        mouse_pos = pygame.mouse.get_pos()
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return False
 
+    def handle_event(self, event, mouse_pos):
+        """
+        处理一个事件（坐标相对于 self.screen），按当前界面状态分发。
+        mouse_pos 为当前鼠标位置，返回 False 表示退出游戏。
+        """
+        if event.type == pygame.QUIT:
+            return False
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            self.needs_redraw = True
+        if self.game_state == "playing":
+            self.handle_playing_event(event, mouse_pos)
+        elif self.game_state == "name_input":
             if event.type == pygame.KEYDOWN:
-                # tower select
-                if event.key == pygame.K_1:
-                    self.selected_tower_type = Cell.G
-                elif event.key == pygame.K_2:
-                    self.selected_tower_type = Cell.A
-                elif event.key == pygame.K_3:
-                    self.selected_tower_type = Cell.C
-                # upgrade via SPACE
-                elif event.key == pygame.K_SPACE:
-                    mx, my = mouse_pos
-                    cell = self.grid.get_cell_by_pixel(mx, my - HUD_H * HUD_LINES)
-                    if cell and cell.type in (Cell.G, Cell.A, Cell.C):
-                        if cell.level < cell.MAX_LEVEL:
-                            ap_cost = 3 * cell.level  # 从n级升级到n+1级消耗 3*n AP
-                            if self.action_points >= ap_cost:
-                                cell.upgrade()
-                                self.action_points -= ap_cost
-                                # 重新计算能量传播并更新得分
-                                self.update_scores()
-                                # 检查是否需要进入结算界面
-                                self.check_game_over()
-
-
+                old_name = self.player_name
+                self.handle_name_input(event)
+                if self.player_name != old_name or self.game_state == "leaderboard":
+                    self.needs_redraw = True
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                # 检查是否点击确认按钮
+                btn_rect = self.draw_name_input()
+                if btn_rect:
+                    x, y = event.pos
+                    if btn_rect[0] <= x <= btn_rect[0] + btn_rect[2] and btn_rect[1] <= y <= btn_rect[1] + btn_rect[3]:
+                        if self.player_name:
+                            self.save_score(self.player_name)
+                            self.cached_leaderboard = self.load_leaderboard()
+                            self.game_state = "leaderboard"
+                self.needs_redraw = True
+        elif self.game_state == "leaderboard":
             if event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:
-                    now = pygame.time.get_ticks()
-                    delta = now - self.last_click_time
-                    self.last_click_time = now
-
-                    # double click - remove
-                    if delta < self.double_click_time_threshold:
-                        self.handle_remove(event.pos)
-                    else:
-                        # single click - build only
-                        self.handle_action(event.pos)
+                if not self.handle_leaderboard_click(event.pos):
+                    return False
+        elif self.game_state == "viewing_result":
+            # 查看上一局结果状态，玩家无法操作，只能点击重开
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                self.handle_restart_click(event.pos)
         return True
 
+    def wants_redraw(self):
+        """是否需要重绘：状态有变化，或名字输入框的光标需要闪烁"""
+        if self.game_state == "name_input":
+            import time
+            phase = int(time.time() * 2)
+            if phase != self.cursor_phase:
+                self.cursor_phase = phase
+                return True
+        # 后台写盘失败或恢复时更新 HUD 上的提示
+        if self.game_state == "playing" and self.autosave_status() != self.shown_autosave_status:
+            return True
+        return self.needs_redraw
+
+    def autosave_status(self):
+        """HUD 上显示的自动存档问题，没有问题时返回 None"""
+        if self.autosaver is not None and self.autosaver.error is not None:
+            return "autosave failed"
+        if self.autosave_error is not None:
+            return "old save ignored"
+        return None
+
+    def draw(self):
+        """把当前界面绘制到 self.screen（不刷新显示）"""
+        if self.camera.covers_view():
+            # 棋盘会覆盖整个视口，只需清空 HUD 区域
+            self.screen.fill((20, 20, 20), (0, 0, WIDTH, HUD_H * HUD_LINES))
+        else:
+            self.screen.fill((20, 20, 20))
+        self.grid.draw(self.screen, HUD_H * HUD_LINES, self.camera)
+        if self.game_state == "name_input":
+            self.draw_name_input()
+        elif self.game_state == "leaderboard":
+            self.draw_leaderboard()
+        else:
+            self.draw_hud()
+        self.needs_redraw = False
+
+    def handle_playing_event(self, event, mouse_pos):
+        if event.type == pygame.KEYDOWN:
+            # tower select
+            if event.key == pygame.K_1:
+                self.selected_tower_type = Cell.G
+            elif event.key == pygame.K_2:
+                self.selected_tower_type = Cell.A
+            elif event.key == pygame.K_3:
+                self.selected_tower_type = Cell.C
+            # upgrade via SPACE
+            elif event.key == pygame.K_SPACE:
+                cell = self.cell_at(mouse_pos)
+                if cell:
+                    self.upgrade_tower(cell.x, cell.y)
+            # 方向键平移，+/- 缩放
+            elif event.key == pygame.K_LEFT:
+                self.camera.pan(self.camera.cell_size, 0)
+            elif event.key == pygame.K_RIGHT:
+                self.camera.pan(-self.camera.cell_size, 0)
+            elif event.key == pygame.K_UP:
+                self.camera.pan(0, self.camera.cell_size)
+            elif event.key == pygame.K_DOWN:
+                self.camera.pan(0, -self.camera.cell_size)
+            elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                self.camera.zoom(1)
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.camera.zoom(-1)
+            self.needs_redraw = True
+
+        # 滚轮以鼠标位置为中心缩放
+        if event.type == pygame.MOUSEWHEEL:
+            self.camera.zoom(event.y, *mouse_pos)
+            self.needs_redraw = True
+
+        # 右键拖动平移
+        if event.type == pygame.MOUSEBUTTONUP and event.button == 3:
+            self.dragging = False
+        if event.type == pygame.MOUSEMOTION and self.dragging:
+            self.camera.pan(*event.rel)
+            self.needs_redraw = True
+
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if event.button == 3:
+                self.dragging = True
+            elif event.button == 1:
+                now = pygame.time.get_ticks()
+                delta = now - self.last_click_time
+                self.last_click_time = now
+
+                # double click - remove
+                if delta < self.double_click_time_threshold:
+                    self.handle_remove(event.pos)
+                else:
+                    # single click - build only
+                    self.handle_action(event.pos)
+                self.needs_redraw = True
+
+    def cell_at(self, pos):
+        """屏幕坐标处的格子（经过视口换算），不在棋盘上时返回 None"""
+        return self.grid.get_cell_by_pixel(pos[0], pos[1], self.camera)
+
     def handle_action(self, pos):
-        cell = self.grid.get_cell_by_pixel(pos[0], pos[1] - HUD_H * HUD_LINES)
-        if not cell or cell.is_obstacle():
-            return
+        cell = self.cell_at(pos)
+        if cell:
+            self.place_tower(cell.x, cell.y, self.selected_tower_type)
+
+    def place_tower(self, x, y, tower_type):
+        """在 (x, y) 放置1级塔，成功返回 True"""
+        cell = self.grid.cells[x][y]
+        if not cell.is_empty() or self.action_points < self.balance.place_cost:
+            return False
 
-        # 检查AP是否足够
-        if self.action_points < 5:
-            return
+        cell.set_tower(tower_type)
+        self.action_points -= self.balance.place_cost
+        # 计算能量传播并更新得分
+        self.update_scores()
+        # 检查是否需要进入结算界面
+        self.check_game_over()
+        return True
 
-        # Move system
-        if cell.is_empty():
-            cell.set_tower(self.selected_tower_type)
-            self.action_points -= 5
-            # 计算能量传播并更新得分
-            self.update_scores()
-            # 检查是否需要进入结算界面
-            self.check_game_over()
+    def upgrade_tower(self, x, y):
+        """升级 (x, y) 处的塔，成功返回 True"""
+        cell = self.grid.cells[x][y]
+        if cell.type not in TOWER_TYPES or cell.level >= cell.MAX_LEVEL:
+            return False
+        ap_cost = self.balance.upgrade_cost(cell.level)
+        if self.action_points < ap_cost:
+            return False
+
+        cell.upgrade()
+        self.action_points -= ap_cost
+        # 重新计算能量传播并更新得分
+        self.update_scores()
+        # 检查是否需要进入结算界面
+        self.check_game_over()
+        return True
+
+    def remove_tower(self, x, y):
+        """移除 (x, y) 处的塔，成功返回 True"""
+        cell = self.grid.cells[x][y]
+        if cell.type not in TOWER_TYPES or self.action_points < self.balance.remove_cost:
+            return False
+
+        cell.clear()
+        self.action_points -= self.balance.remove_cost
+        # 重新计算能量传播并更新得分
+        self.update_scores()
+        # 检查是否需要进入结算界面
+        self.check_game_over()
+        return True
 
+    def apply_action(self, action):
+        """
+        执行一个动作元组，供机器人和脚本使用:
+        ("place", x, y, tower_type) / ("upgrade", x, y) / ("remove", x, y)
+        """
+        if self.game_state != "playing":
+            return False
+        kind = action[0]
+        if kind == "place":
+            return self.place_tower(action[1], action[2], action[3])
+        if kind == "upgrade":
+            return self.upgrade_tower(action[1], action[2])
+        if kind == "remove":
+            return self.remove_tower(action[1], action[2])
+        raise ValueError(f"Invalid action: {action!r}")
 
     def update_scores(self):
-        """更新各项得分"""
-        collected, wasted, max_single_waste, total_output = self.grid.calculate_energy_lines()
-        self.collected_score = collected
+        """更新各项得分；有后台线程时只提交任务，结果由 poll_compute 取回"""
+        self.needs_redraw = True
+        if self.worker is None:
+            totals, _ = compute_energy(self.grid, self.trace)
+            self.apply_scores(totals)
+            return
 
-        # Penalty = 损失能量 × 系数 × (1 + 0.5 × I_{单次损失>总输出30%})
-        penalty_multiplier = 0.5
-        if total_output > 0 and max_single_waste > total_output * 0.3:
-            penalty_multiplier *= 1.5  # 增加50%惩罚
+        # 在布局副本上计算，期间界面继续显示上一次的完整结果；
+        # 遥测先记在任务自己的缓冲区，结果被采纳时才在主线程写入（见 accept_result）
+        board = self.grid.snapshot()
+        board.trace = self.score_trace = self.trace.job() if self.trace is not None else None
+        self.score_version = self.worker.submit(self.score_key, compute_energy, board)
+
+    def apply_scores(self, totals):
+        self.energy_totals = totals
+        self.collected_score, self.penalty_score, self.final_score = score_energy(*totals, self.balance)
+        if self.autosaver is not None:
+            self.autosaver.record(self)
+
+    def poll_compute(self):
+        """每帧调用：取回后台计算结果（独占 worker 时使用，共用时由 SessionManager 分发）"""
+        if self.worker is None:
+            return
+        for key, version, result in self.worker.poll():
+            self.accept_result(key, version, result)
 
-        self.penalty_score = wasted * penalty_multiplier
-        self.final_score = self.collected_score - self.penalty_score
+    def accept_result(self, key, version, result):
+        """只接受当前局面对应的最新计分结果"""
+        if key != self.score_key or version != self.score_version:
+            return
+        if isinstance(result, Exception):
+            raise result
+        totals, energy_lines = result
+        self.score_version = None
+        if self.score_trace is not None:
+            self.trace.commit(self.score_trace)
+            self.score_trace = None
+        self.grid.energy_lines = energy_lines
+        self.apply_scores(totals)
+        self.needs_redraw = True
+        # 计分期间推迟的结算检查
+        self.check_game_over()
 
     def get_min_ap_cost(self):
         """获取当前能执行的最小操作所需的AP"""
         # 放置新塔：5 AP
         # 升级塔：最少3 AP（1级升2级）
         # 移除塔：1 AP
-        return min(5, 3, 1)
+        return self.balance.min_action_cost()
 
     def check_game_over(self):
         """检查是否应该结束游戏"""
+        # 等待后台计分完成，保证结算时的分数与布局一致
+        if self.score_version is not None:
+            return
         min_cost = self.get_min_ap_cost()
         if self.action_points < min_cost:
             # 保存当前状态
             self.save_previous_state()
             self.game_state = "name_input"
             self.needs_redraw = True
+            # 对局已结束，不再需要存档
+            if self.autosaver is not None:
+                self.autosaver.discard()
 
     def save_previous_state(self):
         """保存上一局的游戏状态"""
@@ -463,14 +675,23 @@ class Game:
 
     def restart_game(self):
         """重新开始游戏，刷新地图"""
-        self.grid = Grid()  # 重新生成障碍
-        self.action_points = 100
+        # 重新生成障碍；每日挑战重开仍是同一张地图
+        self.grid = Grid(trace=self.trace, puzzle=self.puzzle, balance=self.balance, size=self.board_size)
+        self.camera.board_size = self.grid.size
+        self.camera.clamp()
+        self.action_points = self.balance.start_ap
         self.collected_score = 0
         self.penalty_score = 0
         self.final_score = 0
+        self.energy_totals = (0, 0, 0, 0)
+        self.score_version = None  # 丢弃上一局未完成的计分
+        self.score_trace = None
         self.selected_tower_type = Cell.G
+        self.autosave_error = None  # 读档失败的提示只在被忽略存档的那一局显示
         self.game_state = "playing"
         self.needs_redraw = True
+        if self.autosaver is not None:
+            self.autosaver.start(self)
 
     def handle_restart_click(self, pos):
         """处理重新开始按钮点击"""
@@ -482,32 +703,16 @@ class Game:
         return False
 
     def handle_remove(self, pos):
-        cell = self.grid.get_cell_by_pixel(pos[0], pos[1] - HUD_H * HUD_LINES)
-        if not cell:
-            return
-
-        # 检查AP是否足够
-        if self.action_points < 1:
-            return
-
-        # only remove tower
-        if cell.type in (Cell.G, Cell.A, Cell.C):
-            cell.type = Cell.EMPTY
-            cell.level = 1
-            self.action_points -= 1
-            # 重新计算能量传播并更新得分
-            self.update_scores()
-            # 检查是否需要进入结算界面
-            self.check_game_over()
+        cell = self.cell_at(pos)
+        if cell:
+            self.remove_tower(cell.x, cell.y)
 
     def render(self):
-        self.screen.fill((20,20,20))
-        self.grid.draw(self.screen, HUD_H * HUD_LINES)
-        self.draw_hud()
+        self.draw()
         pygame.display.flip()
 
     def draw_hud(self):
-        font = pygame.font.SysFont(None, 24)
+        font = self.hud_font
 
         # 第一行：AP 和选中的塔
         pygame.draw.rect(self.screen, (30,30,30), (0, 0, WIDTH, HUD_H))
@@ -531,6 +736,12 @@ class Game:
         btn_rect = btn_txt.get_rect(center=(btn_x + btn_w // 2, btn_y + btn_h // 2))
         self.screen.blit(btn_txt, btn_rect)
 
+        # 自动存档出错时在按钮左侧提示
+        self.shown_autosave_status = self.autosave_status()
+        if self.shown_autosave_status is not None:
+            status_txt = font.render(self.shown_autosave_status, True, (255, 120, 80))
+            self.screen.blit(status_txt, (btn_x - 10 - status_txt.get_width(), 5))
+
         # 第二行：得分信息
         pygame.draw.rect(self.screen, (25,25,25), (0, HUD_H, WIDTH, HUD_H))
 
@@ -545,3 +756,9 @@ class Game:
         offset_x += penalty_txt.get_width() + 15
         final_txt = font.render(f"final: {self.final_score:.2f}", True, (255, 255, 100))
         self.screen.blit(final_txt, (offset_x, HUD_H + 5))
+
+        # 每日挑战显示参考分
+        if self.grid.puzzle is not None:
+            offset_x += final_txt.get_width() + 15
+            par_txt = font.render(f"par: {self.grid.puzzle.par:.0f}", True, (180, 180, 255))
+            self.screen.blit(par_txt, (offset_x, HUD_H + 5))
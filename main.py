@@ -1,11 +1,53 @@
+import os
+from datetime import date
 import pygame
-from game import Game
+from game import Game, AUTOSAVE_FILE
+from core.trace import EnergyTrace
+from core.puzzle_pack import PuzzlePack
+from core.savegame import Autosaver
+from core.worker import ComputeWorker
+from session import SessionManager, split_layout
 
 if __name__ == "__main__":
     pygame.init()
-    screen = pygame.display.set_mode((8*70, 8*70+40*2))
-    pygame.display.set_caption("Energy Grid")
 
-    game = Game(screen)
-    game.run()
+    # 设置 ENERGY_FLOW_PACK=谜题包路径 开启每日挑战，按日期选取地图
+    pack_path = os.environ.get("ENERGY_FLOW_PACK")
+    pack = PuzzlePack(pack_path) if pack_path else None
+    puzzle = pack[date.today().toordinal() % len(pack)] if pack else None
+
+    # 设置 ENERGY_FLOW_BOARD_SIZE=边长 使用沙盒大棋盘（滚轮缩放，右键拖动或方向键平移）
+    board_size = int(os.environ.get("ENERGY_FLOW_BOARD_SIZE", 0)) or None
+    if puzzle is not None and board_size is not None and board_size != puzzle.grid_size:
+        raise SystemExit(f"ENERGY_FLOW_BOARD_SIZE={board_size} does not match the "
+                         f"{puzzle.grid_size}x{puzzle.grid_size} puzzle pack {pack_path}")
+
+    # 设置 ENERGY_FLOW_SESSIONS=N 在一个窗口中分屏运行 N 个对局（活动现场，不自动存档）
+    sessions = int(os.environ.get("ENERGY_FLOW_SESSIONS", 0))
+    if sessions > 1:
+        window_size, rects = split_layout(sessions)
+        screen = pygame.display.set_mode(window_size)
+        pygame.display.set_caption("Energy Grid")
+        manager = SessionManager(screen)
+        for rect in rects:
+            manager.add(rect, puzzle=puzzle, size=board_size)
+        manager.run()
+        manager.close()
+    else:
+        screen = pygame.display.set_mode((8*70, 8*70+40*2))
+        pygame.display.set_caption("Energy Grid")
+
+        # 设置 ENERGY_FLOW_TRACE=目录 开启逐射线遥测（每次启动写入其中新的 run-* 子目录），
+        # ENERGY_FLOW_TRACE_FORMAT 可选 npy/csv/cols
+        trace_dir = os.environ.get("ENERGY_FLOW_TRACE")
+        trace = EnergyTrace(trace_dir, os.environ.get("ENERGY_FLOW_TRACE_FORMAT", "npy")) if trace_dir else None
+
+        autosaver = Autosaver(AUTOSAVE_FILE)
+        worker = ComputeWorker()  # 计分在后台线程进行，不阻塞渲染循环
+        game = Game(screen, trace, puzzle=puzzle, autosaver=autosaver, worker=worker, size=board_size)
+        game.run()
+        worker.close()
+        autosaver.close()
+        if trace is not None:
+            trace.close()
     pygame.quit()
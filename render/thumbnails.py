@@ -0,0 +1,194 @@
+"""
+离屏缩略图渲染（排行榜、网站用）。
+
+棋盘以 Grid.board_code() 的文本编码作为输入，使用 SDL 的 dummy 驱动离屏绘制，
+缩略图的边长固定为 GRID_SIZE × 每格像素，沙盒大棋盘缩小到同样大小。
+多个棋盘拼成一张图集 PNG，由进程池并行生成。输出目录中的 index.json 记录
+每个布局在哪张图集的哪个位置，键为布局编码、格子尺寸与视觉主题的哈希；
+只有新的布局或主题变化（core.sprites.THEME_VERSION / 配色）才会重新渲染。
+
+用法:
+    python -m render.thumbnails --out thumbs --leaderboard .codebuddy/leaderboard.json
+    python -m render.thumbnails --out thumbs --codes layouts.txt --cell 6 --workers 8
+"""
+import os
+import sys
+import json
+import math
+import zlib
+import base64
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+from core.grid import Grid, GRID_SIZE
+from core.sprites import TILES, ENERGY_COLORS, theme_hash
+
+DEFAULT_CELL = 6  # 缩略图中每格的像素
+ATLAS_COLUMNS = 16
+ATLAS_ROWS = 16
+PADDING = 2
+INDEX_VERSION = 2  # 缩略图尺寸规则变化时递增，旧的图集全部作废
+# 排行榜中保存的布局：超过标准棋盘的编码压缩保存，压缩后仍超过上限的不保存
+LAYOUT_PREFIX = "z:"
+MAX_LAYOUT_CHARS = 4096
+
+
+def pack_layout(code):
+    """
+    排行榜中保存的布局编码。标准棋盘保存原始编码，更大的棋盘用 zlib + base64 压缩
+    并加上 LAYOUT_PREFIX；压缩后仍超过 MAX_LAYOUT_CHARS 时返回 None（不保存，没有缩略图）
+    """
+    if len(code) <= GRID_SIZE * GRID_SIZE * 2:
+        return code
+    packed = LAYOUT_PREFIX + base64.b64encode(zlib.compress(code.encode("ascii"), 9)).decode("ascii")
+    return packed if len(packed) <= MAX_LAYOUT_CHARS else None
+
+
+def unpack_layout(stored):
+    """pack_layout 的逆操作，返回 Grid.board_code() 格式的编码"""
+    if stored.startswith(LAYOUT_PREFIX):
+        return zlib.decompress(base64.b64decode(stored[len(LAYOUT_PREFIX):])).decode("ascii")
+    return stored
+
+
+def layout_hash(code, cell_px):
+    return hashlib.sha1(f"{code}|{cell_px}|{theme_hash()}".encode("utf-8")).hexdigest()[:16]
+
+
+def render_board(code, cell_px=DEFAULT_CELL, tiles=TILES):
+    """
+    把一个布局绘制成边长 GRID_SIZE × cell_px 的 Surface（含能量线）。
+    大于标准尺寸的棋盘按能放下的整数像素绘制后再缩小，缩略图大小与棋盘大小无关。
+    """
+    grid = Grid.from_board_code(code)
+    grid.calculate_energy_lines()
+    thumb_px = GRID_SIZE * cell_px
+    draw_px = max(1, thumb_px // grid.size)  # 实际绘制时每格的像素
+    board_px = grid.size * draw_px
+    surface = pygame.Surface((board_px, board_px))
+
+    for x in range(grid.size):
+        for y in range(grid.size):
+            cell = grid.cells[x][y]
+            surface.blit(tiles.get(cell.type, cell.level, draw_px), (x * draw_px, y * draw_px))
+
+    # 能量线只画一层，线宽随能量和格子尺寸缩放
+    half = draw_px / 2
+    for path, energy in grid.energy_lines:
+        if len(path) < 2:
+            continue
+        points = [(x * draw_px + half, y * draw_px + half) for x, y in path]
+        energy_factor = min(3.0, max(0.4, energy / 80.0))
+        width = max(1, int(draw_px * energy_factor / 7))
+        pygame.draw.lines(surface, ENERGY_COLORS[1], False, points, width)
+
+    if board_px != thumb_px:
+        surface = pygame.transform.smoothscale(surface, (thumb_px, thumb_px))
+    return surface
+
+
+def _render_atlas(path, codes, cell_px):
+    """进程池任务：把一批布局渲染进一张图集，返回每个布局的 [x, y, w, h]"""
+    step = GRID_SIZE * cell_px + PADDING  # 缩略图边长固定（见 render_board）
+    rows = math.ceil(len(codes) / ATLAS_COLUMNS)
+    atlas = pygame.Surface((ATLAS_COLUMNS * step, rows * step))
+    atlas.fill((20, 20, 20))
+    rects = []
+    for i, code in enumerate(codes):
+        x = (i % ATLAS_COLUMNS) * step
+        y = (i // ATLAS_COLUMNS) * step
+        thumb = render_board(code, cell_px)
+        atlas.blit(thumb, (x, y))
+        rects.append([x, y, thumb.get_width(), thumb.get_height()])
+    pygame.image.save(atlas, path)
+    return rects
+
+
+class ThumbnailCache:
+    """输出目录中的图集与 index.json"""
+
+    def __init__(self, out_dir, cell_px=DEFAULT_CELL):
+        self.out_dir = out_dir
+        self.cell_px = cell_px
+        self.index_path = os.path.join(out_dir, "index.json")
+        self.index = {"version": INDEX_VERSION, "theme": theme_hash(), "cell": cell_px, "atlases": 0, "entries": {}}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            # 主题、尺寸或缩略图规则变了，旧图集全部作废
+            if (index.get("version") == INDEX_VERSION and index.get("theme") == self.index["theme"]
+                    and index.get("cell") == cell_px):
+                self.index = index
+
+    def lookup(self, code):
+        """已缓存时返回 (图集文件, [x, y, w, h])，否则返回 None"""
+        entry = self.index["entries"].get(layout_hash(code, self.cell_px))
+        if entry is None:
+            return None
+        return os.path.join(self.out_dir, entry[0]), entry[1]
+
+    def update(self, codes, workers=None):
+        """渲染尚未缓存的布局，返回新渲染的数量"""
+        missing = []
+        seen = set()
+        for code in codes:
+            key = layout_hash(code, self.cell_px)
+            if key not in self.index["entries"] and key not in seen:
+                seen.add(key)
+                missing.append(code)
+        if not missing:
+            return 0
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        per_atlas = ATLAS_COLUMNS * ATLAS_ROWS
+        batches = [missing[i:i + per_atlas] for i in range(0, len(missing), per_atlas)]
+        names = []
+        for _ in batches:
+            names.append(f"atlas_{self.index['theme']}_{self.cell_px}_{self.index['atlases']:05d}.png")
+            self.index["atlases"] += 1
+
+        paths = [os.path.join(self.out_dir, name) for name in names]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_render_atlas, paths, batches, [self.cell_px] * len(batches))
+            for name, batch, rects in zip(names, batches, results):
+                for code, rect in zip(batch, rects):
+                    self.index["entries"][layout_hash(code, self.cell_px)] = [name, rect]
+
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+        return len(missing)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render Energy Flow layout thumbnails")
+    parser.add_argument("--out", required=True, help="输出目录")
+    parser.add_argument("--leaderboard", help="排行榜 JSON（读取每条记录的 layout 字段）")
+    parser.add_argument("--codes", help="每行一个布局编码的文本文件（可以是 pack_layout 压缩后的）")
+    parser.add_argument("--cell", type=int, default=DEFAULT_CELL, help=f"标准棋盘每格像素，缩略图边长为 {GRID_SIZE} 倍")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    args = parser.parse_args(argv)
+
+    # 只做离屏绘制，不需要真实窗口
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+    codes = []
+    if args.leaderboard:
+        with open(args.leaderboard, "r", encoding="utf-8") as f:
+            codes.extend(unpack_layout(entry["layout"]) for entry in json.load(f) if entry.get("layout"))
+    if args.codes:
+        with open(args.codes, "r", encoding="utf-8") as f:
+            codes.extend(unpack_layout(line.strip()) for line in f if line.strip())
+
+    cache = ThumbnailCache(args.out, args.cell)
+    n = cache.update(codes, args.workers)
+    print(f"{len(codes)} layouts, {n} rendered")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
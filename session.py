@@ -0,0 +1,183 @@
+"""
+多对局会话管理：一个进程内同时运行多个 Game（活动现场的分屏，或多个远程瘦客户端）。
+
+- 字体、格子贴图和排行榜缩略图在进程内共用（game.load_fonts、core.sprites.TILES、game.THUMBNAILS）；
+- 所有对局共用一个 ComputeWorker，计分任务以 ("score", 会话编号) 为键，同一帧内的请求成批计算；
+- 每帧只处理有待处理事件的会话，只重绘状态有变化的会话，空闲的对局几乎没有开销；
+- 某个会话的计分结果出错时只关闭该会话（异常记录在 Session.error），其他会话照常运行。
+
+分屏会话绘制在主窗口的子区域（subsurface）上，由 dispatch() 把窗口事件按位置路由并换算成
+局部坐标；远程会话绘制在离屏 Surface 上，客户端的输入（局部坐标）用 post() 投递，
+tick() 返回本帧重绘过的会话，服务端只需把这些会话的 surface 发给对应客户端。
+"""
+import math
+import collections
+import pygame
+from game import Game, WIDTH, HEIGHT
+from core.worker import ComputeWorker
+
+# 需要换算坐标的鼠标事件
+POINTER_EVENTS = (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION)
+KEY_EVENTS = (pygame.KEYDOWN, pygame.KEYUP, pygame.TEXTINPUT)
+# 计分未完成时最多推迟重绘的帧数：结果通常一两帧内就到，合并成一次重绘
+MAX_DEFER_FRAMES = 3
+
+
+class Session:
+    """一个对局及其输入队列"""
+
+    def __init__(self, sid, game, rect=None):
+        self.id = sid
+        self.game = game
+        self.rect = rect  # 在主窗口中的区域 pygame.Rect，远程会话为 None
+        self.events = collections.deque()  # 待处理的事件（局部坐标）
+        self.mouse_pos = (0, 0)  # 局部坐标
+        self.deferred = 0  # 已因等待计分推迟重绘的帧数
+        self.closed = False
+        self.error = None  # 计分出错时的异常，该会话随即被关闭，其他会话不受影响
+
+    @property
+    def surface(self):
+        return self.game.screen
+
+
+def split_layout(n, columns=None):
+    """n 个分屏区域的排布，返回 (窗口尺寸, [pygame.Rect])"""
+    columns = columns or math.ceil(math.sqrt(n))
+    rows = math.ceil(n / columns)
+    rects = [pygame.Rect((i % columns) * WIDTH, (i // columns) * HEIGHT, WIDTH, HEIGHT) for i in range(n)]
+    return (columns * WIDTH, rows * HEIGHT), rects
+
+
+class SessionManager:
+    def __init__(self, screen=None, worker=None):
+        self.screen = screen  # 分屏会话所在的窗口，只有远程会话时可为 None
+        self.owns_worker = worker is None
+        self.worker = worker or ComputeWorker()
+        self.sessions = {}  # 会话编号 -> Session
+        self.next_id = 0
+        self.focus = None  # 接收键盘事件的分屏会话（最近点击的）
+        self.grab = None  # 按下鼠标的分屏会话，松开前的鼠标事件都发给它
+
+    def add(self, rect=None, **game_kwargs):
+        """
+        创建会话。传入 rect 时绘制在主窗口的该区域（分屏），否则绘制在离屏 Surface（远程）。
+        game_kwargs 原样传给 Game，如 seed、puzzle、balance、size。
+        """
+        sid = self.next_id
+        self.next_id += 1
+        if rect is not None:
+            rect = pygame.Rect(rect)
+            surface = self.screen.subsurface(rect)
+        else:
+            surface = pygame.Surface((WIDTH, HEIGHT))
+        game = Game(surface, worker=self.worker, score_key=("score", sid), **game_kwargs)
+        session = Session(sid, game, rect)
+        self.sessions[sid] = session
+        if self.focus is None and rect is not None:
+            self.focus = session
+        return session
+
+    def remove(self, sid):
+        session = self.sessions.pop(sid, None)
+        if session is None:
+            return
+        session.closed = True
+        self.worker.forget(session.game.score_key)
+        if self.focus is session:
+            self.focus = None
+        if self.grab is session:
+            self.grab = None
+
+    def post(self, sid, event):
+        """投递远程客户端的事件（坐标已是会话内的局部坐标）"""
+        session = self.sessions.get(sid)
+        if session is None:
+            return
+        if hasattr(event, "pos"):
+            session.mouse_pos = event.pos
+        session.events.append(event)
+
+    def session_at(self, pos):
+        for session in self.sessions.values():
+            if session.rect is not None and session.rect.collidepoint(pos):
+                return session
+        return None
+
+    def dispatch(self, event):
+        """把主窗口的事件路由到对应的分屏会话"""
+        if event.type in POINTER_EVENTS:
+            target = self.grab or self.session_at(event.pos)
+            if target is None:
+                return
+            local = (event.pos[0] - target.rect.x, event.pos[1] - target.rect.y)
+            target.mouse_pos = local
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                self.focus = self.grab = target
+            elif event.type == pygame.MOUSEBUTTONUP:
+                self.grab = None
+            elif self.grab is None:
+                return  # 未按键时的移动只更新鼠标位置，不唤醒会话
+            target.events.append(pygame.event.Event(event.type, {**event.dict, "pos": local}))
+        elif event.type == pygame.MOUSEWHEEL:
+            target = self.session_at(pygame.mouse.get_pos())
+            if target is not None:
+                target.events.append(event)
+        elif event.type in KEY_EVENTS:
+            if self.focus is not None:
+                self.focus.events.append(event)
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            for session in self.sessions.values():
+                session.game.needs_redraw = True
+
+    def tick(self):
+        """
+        推进一帧：分发计分结果，处理有输入的会话，重绘有变化的会话。
+        返回本帧重绘过的会话列表；分屏会话的区域会在这里刷新到窗口。
+        """
+        for key, version, result in self.worker.poll():
+            session = self.sessions.get(key[1])
+            if session is None:
+                continue
+            try:
+                session.game.accept_result(key, version, result)
+            except Exception as e:  # 只关闭出错的会话
+                session.error = e
+                self.remove(session.id)
+
+        for session in list(self.sessions.values()):
+            while session.events:
+                if not session.game.handle_event(session.events.popleft(), session.mouse_pos):
+                    self.remove(session.id)
+                    break
+
+        drawn = []
+        for session in self.sessions.values():
+            game = session.game
+            if game.score_version is not None and game.needs_redraw and session.deferred < MAX_DEFER_FRAMES:
+                session.deferred += 1
+                continue
+            if game.wants_redraw():
+                game.draw()
+                session.deferred = 0
+                drawn.append(session)
+
+        rects = [session.rect for session in drawn if session.rect is not None]
+        if rects:
+            pygame.display.update(rects)
+        return drawn
+
+    def run(self, fps=60):
+        """分屏模式的主循环，所有会话都结束或关闭窗口时返回"""
+        clock = pygame.time.Clock()
+        while self.sessions:
+            clock.tick(fps)
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+                self.dispatch(event)
+            self.tick()
+
+    def close(self):
+        if self.owns_worker:
+            self.worker.close()
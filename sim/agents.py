@@ -0,0 +1,147 @@
+import random
+import importlib
+from core.cell import Cell
+from game import TOWER_TYPES
+from sim import solver
+
+
+class Agent:
+    """
+    机器人基类。
+    每局开始时调用 reset(game)，之后反复调用 choose(game) 取下一个动作，
+    返回 None 表示放弃剩余 AP、结束本局。动作格式见 Game.apply_action。
+    """
+    name = "agent"
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def reset(self, game):
+        pass
+
+    def choose(self, game):
+        return None
+
+
+class RandomAgent(Agent):
+    """随机选择合法动作，移除的概率较低"""
+    name = "random"
+
+    def choose(self, game):
+        grid = game.grid
+        balance = game.balance
+        places, upgrades, removes = [], [], []
+        if game.action_points >= balance.place_cost:
+            for x in range(grid.size):
+                for y in range(grid.size):
+                    if grid.cells[x][y].is_empty():
+                        places.append(("place", x, y, self.rng.choice(TOWER_TYPES)))
+        # 塔按坐标排序，使同一种子下的动作序列与放置顺序无关
+        for _, x, y, level in sorted(grid.towers, key=lambda tower: tower[1:3]):
+            if level < Cell.MAX_LEVEL and game.action_points >= balance.upgrade_cost(level):
+                upgrades.append(("upgrade", x, y))
+            removes.append(("remove", x, y))
+
+        actions = places + upgrades
+        if not actions or self.rng.random() < 0.05:
+            actions = actions + removes
+        if not actions:
+            return None
+        return self.rng.choice(actions)
+
+
+class GreedyAgent(Agent):
+    """每步执行走完后得分最高的走法（见 solver.candidate_moves），直到没有可执行的走法"""
+    name = "greedy"
+
+    def reset(self, game):
+        self.pending = []
+
+    def choose(self, game):
+        if self.pending:
+            return self.pending.pop(0)
+
+        board = solver.scratch_grid(game.grid)
+        best_score = float("-inf")
+        best_move = None
+        best_cost = 0
+        for move in solver.candidate_moves(board, game.action_points):
+            cost, undo = solver.apply_move(board, move)
+            if cost <= game.action_points:
+                score = solver.evaluate(board)
+                if score > best_score or (score == best_score and cost < best_cost):
+                    best_score, best_move, best_cost = score, move, cost
+            solver.undo_move(undo)
+
+        if best_move is None:
+            return None
+        self.pending = list(best_move[1:])
+        return best_move[0]
+
+
+class SolverAgent(Agent):
+    """开局用束搜索求出完整方案，然后按顺序执行"""
+    name = "solver"
+
+    def __init__(self, seed=None, beam_width=4):
+        super().__init__(seed)
+        self.beam_width = beam_width
+
+    def reset(self, game):
+        self.plan = solver.solve(game.grid, game.action_points, self.beam_width).actions
+
+    def choose(self, game):
+        return self.plan.pop(0) if self.plan else None
+
+
+# README 中的“四塔均衡网络”：两行 G → A → C — C，然后升级
+DEFAULT_SCRIPT = [
+    ("place", 0, 3, Cell.G), ("place", 1, 3, Cell.A), ("place", 2, 3, Cell.C), ("place", 3, 3, Cell.C),
+    ("place", 0, 4, Cell.G), ("place", 1, 4, Cell.A), ("place", 2, 4, Cell.C), ("place", 3, 4, Cell.C),
+    ("upgrade", 0, 3), ("upgrade", 0, 4), ("upgrade", 1, 3), ("upgrade", 1, 4),
+    ("upgrade", 2, 3), ("upgrade", 2, 4), ("upgrade", 3, 3), ("upgrade", 3, 4),
+    ("upgrade", 0, 3), ("upgrade", 0, 4),
+]
+
+
+class ScriptedAgent(Agent):
+    """按固定脚本执行，地图上不合法的动作直接跳过"""
+    name = "scripted"
+
+    def __init__(self, seed=None, script=None):
+        super().__init__(seed)
+        self.script = script if script is not None else DEFAULT_SCRIPT
+
+    def reset(self, game):
+        self.step = 0
+
+    def choose(self, game):
+        grid = game.grid
+        while self.step < len(self.script):
+            action = self.script[self.step]
+            self.step += 1
+            cell = grid.cells[action[1]][action[2]]
+            if action[0] == "place" and not cell.is_empty():
+                continue
+            if action[0] != "place" and cell.type not in TOWER_TYPES:
+                continue
+            return action
+        return None
+
+
+AGENTS = {
+    "random": RandomAgent,
+    "greedy": GreedyAgent,
+    "solver": SolverAgent,
+    "scripted": ScriptedAgent,
+}
+
+
+def make_agent(spec, seed=None):
+    """按名字或 "模块:类名" 创建机器人，便于接入外部实现"""
+    if spec in AGENTS:
+        return AGENTS[spec](seed)
+    if ":" in spec:
+        module_name, class_name = spec.split(":", 1)
+        return getattr(importlib.import_module(module_name), class_name)(seed)
+    raise ValueError(f"Invalid agent: {spec}")
@@ -0,0 +1,62 @@
+"""
+生成每日挑战谜题包，参考分由求解器并行计算。
+
+用法:
+    python -m sim.build_pack --out daily.efp --count 1000 --workers 8
+"""
+import os
+import sys
+import argparse
+import collections
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from core.grid import Grid, GRID_SIZE
+from core.puzzle_pack import PuzzlePackWriter
+from core.balance import DEFAULT_BALANCE
+from sim import solver
+
+
+def solve_map(seed, beam_width=4):
+    """生成种子对应的地图并求解，返回 (种子, 参考分, 障碍物, 最佳布局)"""
+    grid = Grid(seed=seed)
+    obstacles = [(x, y) for x in range(grid.size) for y in range(grid.size) if grid.cells[x][y].is_obstacle()]
+    solution = solver.solve(grid, DEFAULT_BALANCE.start_ap, beam_width)
+    return seed, solution.score, obstacles, solution.layout
+
+
+def build_pack(path, seeds, workers=None, beam_width=4):
+    # 同时在途的任务数：每个进程留几个排队，保证进程不空闲
+    window = 4 * (workers or os.cpu_count() or 1)
+    count = 0
+    with PuzzlePackWriter(path, GRID_SIZE) as writer, ProcessPoolExecutor(max_workers=workers) as pool:
+        # 按种子顺序提交和写出，在途任务不超过 window，不需要把整包结果留在内存里
+        pending = collections.deque()
+        for seed in seeds:
+            pending.append(pool.submit(solve_map, seed, beam_width))
+            if len(pending) >= window:
+                writer.append(*pending.popleft().result())
+                count += 1
+        while pending:
+            writer.append(*pending.popleft().result())
+            count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build an Energy Flow puzzle pack")
+    parser.add_argument("--out", required=True, help="输出文件")
+    parser.add_argument("--count", type=int, default=1000, help="谜题数量")
+    parser.add_argument("--seed", type=int, default=0, help="第一张地图的种子")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument("--beam-width", type=int, default=4, help="求解器束宽")
+    args = parser.parse_args(argv)
+
+    n = build_pack(args.out, range(args.seed, args.seed + args.count), args.workers, args.beam_width)
+    print(f"wrote {n} puzzles to {args.out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import copy
+from core.cell import Cell
+from game import TOWER_TYPES, score_energy
+
+DIRECTIONS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+
+
+def scratch_grid(grid):
+    """复制一份用于试算的 Grid（不带遥测，不影响原局面的能量线）"""
+    return copy.deepcopy(grid)
+
+
+def evaluate(grid):
+    """计算当前布局的综合得分"""
+    return score_energy(*grid.calculate_energy_lines(), grid.balance)[2]
+
+
+def get_layout(grid):
+    """当前布局: {(x, y): (塔类型, 等级)}"""
+    return {(x, y): (t, level) for t, x, y, level in grid.towers}
+
+
+def load_layout(grid, layout):
+    """把 grid 上的塔替换为 layout（障碍物不变）"""
+    for t, x, y, level in list(grid.towers):
+        if layout.get((x, y)) != (t, level):
+            grid.cells[x][y].clear()
+    for (x, y), (t, level) in layout.items():
+        cell = grid.cells[x][y]
+        if (cell.type, cell.level) != (t, level):
+            cell.set_state(t, level)
+
+
+def ray_cells(grid, x, y):
+    """从 (x, y) 向四个方向走到障碍物/边界/发生器为止，返回每个方向上的空格列表"""
+    rays = []
+    for dx, dy in DIRECTIONS:
+        cells = []
+        nx, ny = x + dx, y + dy
+        while 0 <= nx < grid.size and 0 <= ny < grid.size:
+            cell = grid.cells[nx][ny]
+            if cell.is_obstacle() or cell.type == Cell.G:
+                break
+            if cell.is_empty():
+                cells.append((nx, ny))
+            nx += dx
+            ny += dy
+        rays.append(cells)
+    return rays
+
+
+def action_cost(grid, action):
+    if action[0] == "place":
+        return grid.balance.place_cost
+    if action[0] == "upgrade":
+        return grid.balance.upgrade_cost(grid.cells[action[1]][action[2]].level)
+    return grid.balance.remove_cost
+
+
+def candidate_moves(grid, ap):
+    """
+    生成候选走法，每个走法是一个动作元组的序列:
+    - 升级已有塔
+    - 在现有能量线上放置 A / C（其余位置放置 A / C 不会改变得分）
+    - 放置 G，或放置 G 并在其某条射线的首/末空格放置 C（单独放 G 几乎总是扣分）
+    """
+    balance = grid.balance
+    moves = []
+    on_ray = set()
+    # 与逐格扫描的顺序一致，保证搜索结果不受放置顺序影响
+    for t, x, y, level in sorted(grid.towers, key=lambda tower: tower[1:3]):
+        if level < Cell.MAX_LEVEL and ap >= balance.upgrade_cost(level):
+            moves.append((("upgrade", x, y),))
+        if t == Cell.G:
+            for cells in ray_cells(grid, x, y):
+                on_ray.update(cells)
+
+    if ap < balance.place_cost:
+        return moves
+    empties = [(x, y) for x in range(grid.size) for y in range(grid.size) if grid.cells[x][y].is_empty()]
+
+    for pos in sorted(on_ray):
+        moves.append((("place", pos[0], pos[1], Cell.A),))
+        moves.append((("place", pos[0], pos[1], Cell.C),))
+
+    for x, y in empties:
+        moves.append((("place", x, y, Cell.G),))
+        if ap < balance.place_cost * 2:
+            continue
+        for cells in ray_cells(grid, x, y):
+            for cx, cy in dict.fromkeys((cells[0], cells[-1])) if cells else ():
+                moves.append((("place", x, y, Cell.G), ("place", cx, cy, Cell.C)))
+    return moves
+
+
+def apply_move(grid, move):
+    """在 grid 上直接执行走法，返回 (消耗AP, 撤销信息)"""
+    cost = 0
+    undo = []
+    for action in move:
+        cost += action_cost(grid, action)
+        cell = grid.cells[action[1]][action[2]]
+        undo.append((cell, cell.type, cell.level))
+        if action[0] == "place":
+            cell.set_tower(action[3])
+        elif action[0] == "upgrade":
+            cell.upgrade()
+        else:
+            cell.clear()
+    return cost, undo
+
+
+def undo_move(undo):
+    for cell, t, level in reversed(undo):
+        cell.set_state(t, level)
+
+
+class Solution:
+    def __init__(self, score, actions, layout):
+        self.score = score
+        self.actions = actions  # 从初始局面出发、可直接交给 Game.apply_action 的动作序列
+        self.layout = layout
+
+    def __repr__(self):
+        return f"Solution(score={self.score:.2f}, actions={len(self.actions)})"
+
+
+def solve(grid, ap, beam_width=4):
+    """
+    束搜索求近似最优布局。
+    每层对束内每个局面展开 candidate_moves，按得分保留前 beam_width 个不重复的布局，
+    直到 AP 用尽或无法展开。返回搜索过程中得分最高的 Solution。
+    """
+    board = scratch_grid(grid)
+    layout = get_layout(board)
+    best = Solution(evaluate(board), [], layout)
+    beam = [(best.score, ap, layout, [])]
+    seen = {tuple(sorted(layout.items()))}
+
+    while beam:
+        children = []
+        for _, left, layout, actions in beam:
+            load_layout(board, layout)
+            for move in candidate_moves(board, left):
+                cost, undo = apply_move(board, move)
+                if cost <= left:
+                    child = dict(layout)
+                    for action in move:
+                        pos = (action[1], action[2])
+                        cell = board.cells[pos[0]][pos[1]]
+                        if cell.type in TOWER_TYPES:
+                            child[pos] = (cell.type, cell.level)
+                        else:
+                            child.pop(pos, None)
+                    key = tuple(sorted(child.items()))
+                    if key not in seen:
+                        seen.add(key)
+                        children.append((evaluate(board), left - cost, child, actions + list(move)))
+                undo_move(undo)
+
+        children.sort(key=lambda c: c[0], reverse=True)
+        beam = children[:beam_width]
+        if beam and beam[0][0] > best.score:
+            best = Solution(beam[0][0], beam[0][3], beam[0][2])
+
+    return best
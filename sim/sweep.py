@@ -0,0 +1,319 @@
+"""
+数值平衡参数扫描。
+
+在参数网格的每个点上，用一批地图评估固定策略（脚本）和搜索策略（greedy / solver）的得分，
+结果以列式文件写入输出目录，中断后用同样的命令重新运行即可从断点继续。
+
+用法:
+    python -m sim.sweep --out sweeps/penalty --maps 200 \\
+        --param penalty_base=0.4,0.5,0.6 --param amplifier_scale=0.8,1.0,1.2 \\
+        --search greedy --search-maps 20
+
+可扫描的参数见 KNOBS。只影响数值、不影响 AP 的参数点共用同一批脚本布局，
+布局先编译成与数值无关的射线序列（compile_rays），再对所有参数点批量计分（score_rays）。
+"""
+import os
+import sys
+import json
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from core.cell import Cell
+from core.balance import DEFAULT_BALANCE
+from core.trace import ColumnBuffer, append_row_group, read_columns, END_BOUNDARY, END_OBSTACLE, END_GENERATOR
+from sim.agents import ScriptedAgent, DEFAULT_SCRIPT, make_agent
+from sim.solver import DIRECTIONS
+from sim.tournament import run_agent, count_towers
+
+# 参数名 -> 默认值
+KNOBS = {
+    "generator_base": 100,        # 1级 G 能量
+    "generator_step": 25,         # G 每级增加的能量
+    "amplifier_scale": 1.0,       # A 增益缩放：倍数 = 1 + (默认倍数 - 1) × scale
+    "collector_scale": 1.0,       # C 效率缩放（上限 100%）
+    "start_ap": DEFAULT_BALANCE.start_ap,
+    "place_cost": DEFAULT_BALANCE.place_cost,
+    "remove_cost": DEFAULT_BALANCE.remove_cost,
+    "upgrade_factor": DEFAULT_BALANCE.upgrade_factor,
+    "penalty_base": DEFAULT_BALANCE.penalty_base,
+    "penalty_major_ratio": DEFAULT_BALANCE.penalty_major_ratio,
+    "penalty_major_factor": DEFAULT_BALANCE.penalty_major_factor,
+}
+# 会改变脚本实际走法的参数
+COST_KNOBS = ("start_ap", "place_cost", "remove_cost", "upgrade_factor")
+
+# README 中的“单塔垄断”：一个满级 G 配一个 1 级 C
+MONOPOLY_SCRIPT = [
+    ("place", 0, 3, Cell.G), ("place", 7, 3, Cell.C),
+    ("upgrade", 0, 3), ("upgrade", 0, 3), ("upgrade", 0, 3), ("upgrade", 0, 3),
+]
+CANONICAL = {"network": DEFAULT_SCRIPT, "monopoly": MONOPOLY_SCRIPT}
+SEARCH = ("greedy", "solver")
+STRATEGIES = tuple(CANONICAL) + SEARCH
+
+RESULT_COLUMNS = (
+    ("point", "i"),
+    ("seed", "i"),
+    ("strategy", "b"),    # STRATEGIES 中的下标
+    ("collected", "d"),
+    ("penalty", "d"),
+    ("final", "d"),
+    ("ap_left", "h"),
+    ("towers", "h"),
+)
+
+
+def make_balance(point):
+    """把参数点转换成 Balance"""
+    knobs = dict(KNOBS, **point)
+    default = DEFAULT_BALANCE
+    return default.replace(
+        generator_energy={level: knobs["generator_base"] + (level - 1) * knobs["generator_step"]
+                          for level in default.generator_energy},
+        amplifier_multipliers={level: 1 + (m - 1) * knobs["amplifier_scale"]
+                               for level, m in default.amplifier_multipliers.items()},
+        collector_efficiencies={level: min(1.0, e * knobs["collector_scale"])
+                                for level, e in default.collector_efficiencies.items()},
+        **{name: knobs[name] for name in ("start_ap", "place_cost", "remove_cost", "upgrade_factor",
+                                          "penalty_base", "penalty_major_ratio", "penalty_major_factor")},
+    )
+
+
+def compile_rays(grid):
+    """
+    把布局编译成与数值无关的射线列表 [(G等级, ((塔类型, 等级), ...), 终止原因)]，
+    与 Grid._propagate_energy 的传播规则一致
+    """
+    rays = []
+    for x, y, level in sorted(grid.towers.of(Cell.G)):
+        for dx, dy in DIRECTIONS:
+            ops = []
+            end = END_BOUNDARY
+            nx, ny = x + dx, y + dy
+            while 0 <= nx < grid.size and 0 <= ny < grid.size:
+                other = grid.cells[nx][ny]
+                if other.is_obstacle():
+                    end = END_OBSTACLE
+                    break
+                if other.type == Cell.G:
+                    end = END_GENERATOR
+                    break
+                if other.type in (Cell.A, Cell.C):
+                    ops.append((other.type, other.level))
+                nx += dx
+                ny += dy
+            rays.append((level, tuple(ops), end))
+    return rays
+
+
+def score_rays(rays, balance):
+    """用给定数值对编译好的射线计分，返回 (收集得分, 惩罚得分, 综合得分)"""
+    gen = balance.generator_energy
+    amp = balance.amplifier_multipliers
+    eff = balance.collector_efficiencies
+    collected = wasted = max_single = total = 0.0
+    for g_level, ops, end in rays:
+        energy = gen[g_level]
+        total += energy
+        absorbed = end == END_GENERATOR
+        for t, level in ops:
+            if t == Cell.A:
+                energy *= amp[level]
+            else:
+                k = eff[level]
+                collected += energy * k
+                if k >= 1.0:
+                    absorbed = True
+                    break
+                energy *= 1.0 - k
+        if not absorbed:
+            wasted += energy
+            max_single = max(max_single, energy)
+    penalty = balance.penalty(wasted, max_single, total)
+    return collected, penalty, collected - penalty
+
+
+def expand_grid(spec):
+    """{参数名: [取值, ...]} -> 参数点列表（按参数名排序后做笛卡尔积）"""
+    for name in spec:
+        if name not in KNOBS:
+            raise ValueError(f"Invalid sweep parameter: {name}")
+    names = sorted(spec)
+    return [dict(zip(names, values)) for values in itertools.product(*(spec[n] for n in names))]
+
+
+def _run_batch(batch, seeds, search, search_maps):
+    """
+    进程池任务：batch 为同一组 AP 参数下的 [(点编号, 参数点), ...]。
+    脚本策略每张地图只打一局并编译射线，再对 batch 内所有点批量计分；
+    搜索策略在前 search_maps 张地图上按各点的数值分别对局。
+    """
+    cost_balance = make_balance(batch[0][1])
+    results = {pid: [] for pid, _ in batch}
+    balances = [(pid, make_balance(point)) for pid, point in batch]
+
+    for name, script in CANONICAL.items():
+        code = STRATEGIES.index(name)
+        for seed in seeds:
+            game, _ = run_agent(ScriptedAgent(seed, script), seed, cost_balance)
+            rays = compile_rays(game.grid)
+            towers = count_towers(game.grid)
+            for pid, balance in balances:
+                collected, penalty, final = score_rays(rays, balance)
+                results[pid].append((pid, seed, code, collected, penalty, final, game.action_points, towers))
+
+    for name in search:
+        code = STRATEGIES.index(name)
+        for seed in seeds[:search_maps]:
+            for pid, balance in balances:
+                game, _ = run_agent(make_agent(name, seed), seed, balance)
+                results[pid].append((pid, seed, code, game.collected_score, game.penalty_score,
+                                     game.final_score, game.action_points, count_towers(game.grid)))
+    return results
+
+
+class Sweep:
+    """一次参数扫描及其输出目录（sweep.json 配置、results.efc 结果、done.log 进度）"""
+
+    def __init__(self, out_dir, spec, seeds, search=(), search_maps=0):
+        self.out_dir = out_dir
+        self.config = {
+            "grid": spec,
+            "seeds": list(seeds),
+            "search": list(search),
+            "search_maps": search_maps,
+        }
+        self.points = expand_grid(spec)
+        self.results_path = os.path.join(out_dir, "results.efc")
+        self.done_path = os.path.join(out_dir, "done.log")
+
+    def prepare(self):
+        """写入或校验配置，并把结果文件截断到最后一个完整的参数点，返回已完成的点编号"""
+        os.makedirs(self.out_dir, exist_ok=True)
+        config_path = os.path.join(self.out_dir, "sweep.json")
+        if os.path.exists(config_path):
+            with open(config_path, "r", encoding="utf-8") as f:
+                if json.load(f) != json.loads(json.dumps(self.config)):
+                    raise ValueError(f"Sweep config differs from the one in {self.out_dir}; use a new output directory")
+        else:
+            with open(config_path, "w", encoding="utf-8") as f:
+                json.dump(self.config, f, indent=2)
+
+        done = set()
+        end = 0
+        if os.path.exists(self.done_path):
+            with open(self.done_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2:
+                        done.add(int(parts[0]))
+                        end = int(parts[1])
+        if os.path.exists(self.results_path):
+            with open(self.results_path, "r+b") as f:
+                f.truncate(end)
+        return done
+
+    def batches(self, todo, batch_size):
+        """按 AP 参数分组，每组再切成不超过 batch_size 个点的任务"""
+        groups = {}
+        for pid in todo:
+            point = dict(KNOBS, **self.points[pid])
+            groups.setdefault(tuple(point[k] for k in COST_KNOBS), []).append((pid, self.points[pid]))
+        for group in groups.values():
+            for i in range(0, len(group), batch_size):
+                yield group[i:i + batch_size]
+
+    def run(self, workers=None, batch_size=16, log=print):
+        done = self.prepare()
+        todo = [pid for pid in range(len(self.points)) if pid not in done]
+        log(f"{len(self.points)} points, {len(done)} done, {len(todo)} to go")
+        if not todo:
+            return
+
+        seeds = self.config["seeds"]
+        search = self.config["search"]
+        search_maps = self.config["search_maps"]
+        rows_per_point = len(seeds) * len(CANONICAL) + min(search_maps, len(seeds)) * len(search)
+        buf = ColumnBuffer(RESULT_COLUMNS, rows_per_point)
+        batches = list(self.batches(todo, batch_size))
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_batch, batch, seeds, search, search_maps) for batch in batches]
+            for future in futures:
+                for pid, rows in future.result().items():
+                    buf.clear()
+                    for row in rows:
+                        for col, value in zip(buf.data, row):
+                            col[buf.count] = value
+                        buf.count += 1
+                    # 先写结果再记进度，中断后按进度截断结果文件
+                    end = append_row_group(self.results_path, buf, fsync=True)
+                    with open(self.done_path, "a", encoding="utf-8") as f:
+                        f.write(f"{pid} {end}\n")
+                        f.flush()
+                        os.fsync(f.fileno())
+                    done.add(pid)
+                log(f"{len(done)}/{len(self.points)} points")
+
+    def summary(self):
+        """每个参数点上各策略的平均综合得分: [(参数点, {策略名: 均值})]"""
+        if not os.path.exists(self.results_path):
+            return []
+        cols = read_columns(self.results_path)
+        sums = {}
+        for pid, code, final in zip(cols["point"], cols["strategy"], cols["final"]):
+            s = sums.setdefault((pid, code), [0.0, 0])
+            s[0] += final
+            s[1] += 1
+        table = []
+        for pid, point in enumerate(self.points):
+            means = {name: sums[(pid, code)][0] / sums[(pid, code)][1]
+                     for code, name in enumerate(STRATEGIES) if (pid, code) in sums}
+            if means:
+                table.append((point, means))
+        return table
+
+
+def parse_param(text):
+    name, _, values = text.partition("=")
+    return name, [float(v) if "." in v else int(v) for v in values.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Energy Flow balance parameter sweep")
+    parser.add_argument("--out", required=True, help="输出目录，重复运行时从断点继续")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="扫描的参数及取值，可重复；可选: " + ", ".join(KNOBS))
+    parser.add_argument("--grid", help="从 JSON 文件读取参数网格 {参数名: [取值, ...]}")
+    parser.add_argument("--maps", type=int, default=100, help="地图数量")
+    parser.add_argument("--seed", type=int, default=0, help="第一张地图的种子")
+    parser.add_argument("--search", default="", help="逗号分隔的搜索策略: " + ",".join(SEARCH))
+    parser.add_argument("--search-maps", type=int, default=10, help="搜索策略使用的地图数量")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    args = parser.parse_args(argv)
+
+    spec = {}
+    if args.grid:
+        with open(args.grid, "r", encoding="utf-8") as f:
+            spec.update(json.load(f))
+    spec.update(parse_param(p) for p in args.param)
+    search = [s for s in args.search.split(",") if s]
+    for s in search:
+        if s not in SEARCH:
+            parser.error(f"invalid search strategy: {s}")
+
+    sweep = Sweep(args.out, spec, range(args.seed, args.seed + args.maps), search, args.search_maps)
+    sweep.run(args.workers)
+
+    for point, means in sweep.summary():
+        params = " ".join(f"{k}={v}" for k, v in point.items())
+        scores = "  ".join(f"{name}: {mean:.1f}" for name, mean in means.items())
+        print(f"{params:<50}{scores}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""
+机器人对局与自博弈工具。
+
+用法:
+    python -m sim.tournament --agents greedy,solver,random --maps 1000 --workers 8 --out results.json
+
+每张地图由种子确定，所有机器人在同一组地图上对局，便于做配对比较。
+"""
+import os
+import sys
+import json
+import math
+import argparse
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from game import Game
+from sim.agents import make_agent
+
+MAX_STEPS = 500  # 单局动作上限，防止机器人卡住
+LONG_RUN = 4  # 至少能放下 G→A→C→C 的连续空段才计入 long_runs
+
+
+def map_features(grid):
+    """地图特征，用于按特征分组统计（生成的地图障碍物数量固定，不作为特征）"""
+    border = 0
+    blocked_rows = set()
+    blocked_cols = set()
+    for x in range(grid.size):
+        for y in range(grid.size):
+            if grid.cells[x][y].is_obstacle():
+                blocked_cols.add(x)
+                blocked_rows.add(y)
+                if x in (0, grid.size - 1) or y in (0, grid.size - 1):
+                    border += 1
+    return {
+        "long_runs": sum(1 for run in open_runs(grid) if run >= LONG_RUN),
+        "border_obstacles": border,
+        "open_lines": 2 * grid.size - len(blocked_rows) - len(blocked_cols),  # 没有障碍物的整行/整列数
+    }
+
+
+def open_runs(grid):
+    """每行、每列被障碍物分隔出的连续非障碍段的长度"""
+    runs = []
+    for line in range(grid.size):
+        row_run = col_run = 0
+        for i in range(grid.size):
+            if grid.cells[line][i].is_obstacle():
+                if col_run:
+                    runs.append(col_run)
+                col_run = 0
+            else:
+                col_run += 1
+            if grid.cells[i][line].is_obstacle():
+                if row_run:
+                    runs.append(row_run)
+                row_run = 0
+            else:
+                row_run += 1
+        runs.extend(run for run in (row_run, col_run) if run)
+    return runs
+
+
+def run_agent(agent, seed, balance=None):
+    """用真实的 Game 规则在无界面模式下打一局，返回 (结束时的 Game, 动作数)"""
+    game = Game(None, seed=seed, balance=balance)
+    agent.reset(game)
+    steps = 0
+    while game.game_state == "playing" and steps < MAX_STEPS:
+        action = agent.choose(game)
+        if action is None:
+            break
+        game.apply_action(action)
+        steps += 1
+    return game, steps
+
+
+def count_towers(grid):
+    return len(grid.towers)
+
+
+def play_game(agent, seed):
+    """打一局并返回结果字典"""
+    game, steps = run_agent(agent, seed)
+    return {
+        "seed": seed,
+        "score": game.final_score,
+        "ap_left": game.action_points,
+        "towers": count_towers(game.grid),
+        "steps": steps,
+        **map_features(game.grid),
+    }
+
+
+def _run_chunk(agent_specs, seeds):
+    """进程池任务：在一批地图上让所有机器人各打一局"""
+    rows = []
+    for seed in seeds:
+        for spec in agent_specs:
+            row = play_game(make_agent(spec, seed), seed)
+            row["agent"] = spec
+            rows.append(row)
+    return rows
+
+
+def run_tournament(agent_specs, seeds, workers=None, chunk_size=16):
+    seeds = list(seeds)
+    chunks = [seeds[i:i + chunk_size] for i in range(0, len(seeds), chunk_size)]
+    rows = []
+    if workers == 1:
+        for chunk in chunks:
+            rows.extend(_run_chunk(agent_specs, chunk))
+        return rows
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(_run_chunk, [agent_specs] * len(chunks), chunks):
+            rows.extend(result)
+    return rows
+
+
+def summarize(values, z=1.96):
+    """均值、标准差、分位数及均值的 95% 置信区间（正态近似）"""
+    n = len(values)
+    mean = statistics.fmean(values)
+    stdev = statistics.stdev(values) if n > 1 else 0.0
+    half = z * stdev / math.sqrt(n) if n > 1 else 0.0
+    ordered = sorted(values)
+    return {
+        "n": n,
+        "mean": mean,
+        "stdev": stdev,
+        "ci_low": mean - half,
+        "ci_high": mean + half,
+        "min": ordered[0],
+        "p25": ordered[n // 4],
+        "median": statistics.median(ordered),
+        "p75": ordered[(3 * n) // 4],
+        "max": ordered[-1],
+    }
+
+
+def aggregate(rows, agent_specs, degenerate_ratio=0.5):
+    by_agent = {spec: {} for spec in agent_specs}
+    for row in rows:
+        by_agent[row["agent"]][row["seed"]] = row
+
+    report = {"agents": {}, "by_feature": {}, "comparisons": [], "degenerate_maps": []}
+
+    # 每个机器人的得分分布
+    for spec, games in by_agent.items():
+        report["agents"][spec] = summarize([r["score"] for r in games.values()])
+
+    # 按地图特征分组
+    for feature in ("long_runs", "border_obstacles", "open_lines"):
+        table = {}
+        for spec, games in by_agent.items():
+            groups = {}
+            for r in games.values():
+                groups.setdefault(r[feature], []).append(r["score"])
+            table[spec] = {value: summarize(scores) for value, scores in sorted(groups.items())}
+        report["by_feature"][feature] = table
+
+    # 配对比较：同一张地图上的得分差
+    for i, a in enumerate(agent_specs):
+        for b in agent_specs[i + 1:]:
+            seeds = by_agent[a].keys() & by_agent[b].keys()
+            diffs = [by_agent[a][s]["score"] - by_agent[b][s]["score"] for s in seeds]
+            if diffs:
+                stats = summarize(diffs)
+                stats["a"], stats["b"] = a, b
+                stats["a_wins"] = sum(1 for d in diffs if d > 0) / len(diffs)
+                report["comparisons"].append(stats)
+
+    # 所有机器人都打不出分的地图
+    best = {}
+    for games in by_agent.values():
+        for seed, r in games.items():
+            best[seed] = max(best.get(seed, float("-inf")), r["score"])
+    median_best = statistics.median(best.values()) if best else 0
+    if median_best > 0:
+        threshold = median_best * degenerate_ratio
+        report["degenerate_maps"] = sorted(
+            ({"seed": seed, "best_score": score} for seed, score in best.items() if score < threshold),
+            key=lambda m: m["best_score"],
+        )
+    return report
+
+
+def print_report(report):
+    print(f"{'agent':<12}{'n':>6}{'mean':>10}{'95% CI':>22}{'median':>10}{'min':>10}{'max':>10}")
+    for spec, s in report["agents"].items():
+        ci = f"[{s['ci_low']:.1f}, {s['ci_high']:.1f}]"
+        print(f"{spec:<12}{s['n']:>6}{s['mean']:>10.1f}{ci:>22}{s['median']:>10.1f}{s['min']:>10.1f}{s['max']:>10.1f}")
+
+    print()
+    for c in report["comparisons"]:
+        print(f"{c['a']} - {c['b']}: {c['mean']:+.1f} [{c['ci_low']:+.1f}, {c['ci_high']:+.1f}], "
+              f"{c['a']} wins {c['a_wins']:.0%}")
+
+    print()
+    for feature, table in report["by_feature"].items():
+        print(f"by {feature}:")
+        for spec, groups in table.items():
+            cells = "  ".join(f"{value}: {s['mean']:.0f}±{s['mean'] - s['ci_low']:.0f} (n={s['n']})"
+                              for value, s in groups.items())
+            print(f"  {spec:<10}{cells}")
+
+    degenerate = report["degenerate_maps"]
+    print()
+    print(f"degenerate maps: {len(degenerate)}")
+    for m in degenerate[:20]:
+        print(f"  seed {m['seed']}: best {m['best_score']:.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Energy Flow bot tournament")
+    parser.add_argument("--agents", default="greedy,solver,scripted,random",
+                        help="逗号分隔的机器人名，或 模块:类名")
+    parser.add_argument("--maps", type=int, default=100, help="地图数量")
+    parser.add_argument("--seed", type=int, default=0, help="第一张地图的种子")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument("--out", help="把原始结果和汇总写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    agent_specs = args.agents.split(",")
+    rows = run_tournament(agent_specs, range(args.seed, args.seed + args.maps), args.workers)
+    report = aggregate(rows, agent_specs)
+    print_report(report)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"games": rows, "report": report}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())